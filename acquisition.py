@@ -0,0 +1,368 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import sys
+import time
+import select
+import threading
+import collections
+import numpy as np
+import libtiepie
+import utils
+from stats import Stats
+
+# Frames waiting for the consumer thread of a worker:
+CONSUMER_QUEUE_SIZE = 1
+# Buffers read into, queued, consumed and rendered at the same time:
+BUFFER_COUNT = CONSUMER_QUEUE_SIZE + 3
+
+
+class AcquisitionBuffer(object):
+    def __init__(self, channels, length, allocate=True, segment_count=1):
+        self.channels = channels
+        self.length = length
+        self.segment_count = segment_count
+        self.index = 0
+        self.timestamp = 0
+        # Host time each segment was read out, not its trigger time:
+        self.segment_timestamps = np.zeros(segment_count)
+        self.sample_frequency = 0
+        self.segments = None
+        self.block = None
+        self.data = [None] * len(channels)
+        self.pointers = libtiepie.api.HlpPointerArrayNew(len(channels))
+        if allocate:
+            self.set_segments(np.empty((segment_count, sum(1 for active in channels if active), length), dtype=np.float32))
+
+    def set_segments(self, segments):
+        # All segments of a segmented capture in one contiguous (segments, channels, samples) array:
+        self.segments = segments
+        self.set_block(segments[-1])
+
+    def set_block(self, block):
+        # One row per active channel, so all channels can be processed in one pass:
+        self.block = block
+        j = 0
+        for i in range(len(self.channels)):
+            if self.channels[i]:
+                self.data[i] = block[j]
+                libtiepie.api.HlpPointerArraySet(self.pointers, i, block[j].ctypes.data)
+                j += 1
+
+    def __del__(self):
+        self.free()
+
+    def free(self):
+        if self.pointers is not None:
+            libtiepie.api.HlpPointerArrayDelete(self.pointers)
+            self.pointers = None
+
+
+class BufferPool(object):
+    def __init__(self, count=1):
+        self.hits = 0
+        self.reallocations = 0
+        self._count = count
+        self._buffers = []
+        self._index = 0
+
+    def get(self, channels, length, exclude=(), segment_count=1):
+        channels = tuple(channels)
+        if self._buffers and (self._buffers[0].channels, self._buffers[0].length, self._buffers[0].segment_count) == (channels, length, segment_count):
+            self.hits += 1
+        else:
+            self.clear()
+            self._buffers = [AcquisitionBuffer(channels, length, True, segment_count) for i in range(self._count)]
+            self.reallocations += 1
+
+        # Round robin, skipping the buffers that are still in use:
+        for i in range(self._count):
+            buf = self._buffers[self._index]
+            self._index = (self._index + 1) % self._count
+            if buf not in exclude:
+                return buf
+
+        raise Exception("No free acquisition buffer")
+
+    def clear(self):
+        for buf in self._buffers:
+            buf.free()
+        self._buffers = []
+        self._index = 0
+
+
+class AcquisitionHub(threading.Thread):
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        # One hub thread services the data ready events of all open oscilloscopes:
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.start()
+            return cls._instance
+
+    def __init__(self):
+        super(AcquisitionHub, self).__init__()
+        self.daemon = True
+
+        self.rounds = 0
+
+        self._epoll = select.epoll()
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    def register(self, worker):
+        with self._lock:
+            self._workers[worker.fd] = worker
+            self._epoll.register(worker.fd, select.EPOLLIN)
+
+    def unregister(self, worker):
+        # Waits for a readout in progress, the worker is not serviced afterwards:
+        with self._lock:
+            if self._workers.pop(worker.fd, None) is not None:
+                self._epoll.unregister(worker.fd)
+
+    @property
+    def workers(self):
+        with self._lock:
+            return list(self._workers.values())
+
+    def run(self):
+        while True:
+            events = self._epoll.poll(0.1)
+
+            # Every ready device is serviced once per round, in order of arrival, so a
+            # device with short records can't starve the others. Only the readout and
+            # re-arm run here, the consumers run on a thread per worker:
+            for fd, event in events:
+                with self._lock:
+                    worker = self._workers.get(fd)
+                    if worker is not None:
+                        try:
+                            worker.service()
+                        except Exception, e:
+                            print(e, file=sys.stderr)
+            if events:
+                self.rounds += 1
+
+
+class AcquisitionWorker(object):
+    def __init__(self, scp, fd, callback, stats=None):
+        self.fd = fd
+        self.stats = stats if stats is not None else Stats()
+
+        self.continuous = False
+        self.settings = None
+        self.consumers = []
+        self.recorder = None
+        # Wait for the consumers instead of skipping frames, stalls the hub for all workers:
+        self.lossless = False
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.unprocessed = 0
+        self.pool = BufferPool(BUFFER_COUNT)
+
+        self._scp = scp
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._pending = collections.deque()
+        self._busy = []
+        self._latest = None
+        self._rendering = None
+        self._armed_settings = None
+        self._armed = 0
+        self._reads = 0
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._consume)
+        self._thread.daemon = True
+        self._thread.start()
+        AcquisitionHub.instance().register(self)
+
+    def stop(self):
+        AcquisitionHub.instance().unregister(self)
+        # Frames already read are still passed to the consumers:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def service(self):
+        t = self.stats.time()
+        utils.eventfd_clear(self.fd)
+        if self._armed_settings is None:
+            # Left over from before this worker armed the scope:
+            return
+        self.stats.add("latency", self._armed)
+        self._read(t)
+
+    def arm(self, continuous):
+        # Serialized with the re-arm on the hub thread and with disarm():
+        with self._lock:
+            self.continuous = continuous
+            self._arm()
+
+    def disarm(self):
+        # Under the same lock, so a re-arm in progress can't restart the scope after this:
+        with self._lock:
+            self.continuous = False
+            self._scp.stop()
+
+    def _arm(self):
+        t = self.stats.time()
+        self._armed_settings = self.settings
+        self._scp.start()
+        self._armed = t
+        self.stats.add("arm", t)
+
+    def take(self):
+        with self._lock:
+            buf = self._latest
+            if buf is not None:
+                self._latest = None
+                self._rendering = buf
+            return buf
+
+    def _read(self, ready):
+        stats = self.stats
+        scp = self._scp
+        # Settings the finished acquisition was armed with, no library calls needed:
+        settings = self._armed_settings
+        # Estimate of the library reads this replaces: the record length, segment count and
+        # sample frequency, and the enabled state of every channel. The bindings may cache some:
+        stats.increment("saved_calls", 3 + settings.channel_count)
+        length = settings.record_length
+        segment_count = settings.segment_count
+
+        recorder = self.recorder
+
+        with self._lock:
+            exclude = self._busy + [self._rendering]
+            buf = None
+            if recorder is not None:
+                try:
+                    buf = recorder.get(settings.active_channels, length, exclude, segment_count)
+                except Exception, e:
+                    # Keep acquiring, this frame isn't recorded:
+                    print(e, file=sys.stderr)
+            if buf is None:
+                recorder = None
+                buf = self.pool.get(settings.active_channels, length, exclude, segment_count)
+            if buf is self._latest:
+                # Not rendered yet, only the latest frame is displayed:
+                self._latest = None
+                self.dropped += 1
+
+        try:
+            t = stats.time()
+            if segment_count == 1:
+                libtiepie.api.ScpGetData(scp._handle, buf.pointers, settings.channel_count, 0, length)
+                buf.segment_timestamps[0] = time.time()
+            else:
+                # Segments are read in order, one ScpGetData call each, straight into their slice:
+                for segment in range(segment_count):
+                    buf.set_block(buf.segments[segment])
+                    libtiepie.api.ScpGetData(scp._handle, buf.pointers, settings.channel_count, 0, length)
+                    buf.segment_timestamps[segment] = time.time()
+            stats.add("get_data", t)
+            buf.index = self._reads
+            self._reads += 1
+            buf.timestamp = buf.segment_timestamps[-1]
+            buf.sample_frequency = settings.sample_frequency
+        except:
+            if recorder is not None:
+                recorder.abort(buf)
+            raise
+        if recorder is not None:
+            recorder.commit(buf)
+
+        # Re-arm before handing the frame to the consumers and the GUI, so the
+        # next acquisition runs while this one is processed:
+        with self._lock:
+            rearmed = self.continuous
+            if rearmed:
+                self._arm()
+        if rearmed:
+            stats.add("dead_time", ready)
+
+        with self._condition:
+            while self.lossless and len(self._pending) >= CONSUMER_QUEUE_SIZE and not self._stopping:
+                self._condition.wait()
+            if len(self._pending) >= CONSUMER_QUEUE_SIZE:
+                # The consumers are behind, the oldest waiting frame is skipped:
+                self._busy.remove(self._pending.popleft())
+                self.unprocessed += 1
+            self._pending.append(buf)
+            self._busy.append(buf)
+            self._condition.notify_all()
+
+    def _consume(self):
+        stats = self.stats
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                buf = self._pending.popleft()
+                self._condition.notify_all()
+
+            # Consumers see every frame, not only the rendered ones:
+            t = stats.time()
+            try:
+                for consumer in self.consumers:
+                    consumer(buf)
+            except Exception, e:
+                print(e, file=sys.stderr)
+            stats.add("consumers", t)
+
+            with self._condition:
+                self._busy.remove(buf)
+                # Only notify when the slot was empty, at most one notification is pending:
+                notify = self._latest is None
+                if not notify:
+                    self.dropped += 1
+                self._latest = buf
+            self.frames += 1
+            self.bytes += buf.segments.nbytes
+
+            if notify:
+                self._callback()
@@ -0,0 +1,148 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import os
+import sys
+import signal
+import threading
+import traceback
+import multiprocessing
+from shmring import ShmRing, ShmRingReader
+from measurements import MeasurementEngine
+
+PENDING_PER_WORKER = 2
+RING_NAME = "libtiepie-ui-analysis-{:d}-{:d}"
+
+# State of a worker process:
+_readers = {}
+_engine = None
+
+
+def _init_worker():
+    # Ctrl+C is handled by the parent, which terminates the pool:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run(function, name, frame):
+    try:
+        reader = _readers.get(name)
+        if reader is None:
+            # The pool only replaces its ring when nothing is pending, so the previous one is done:
+            _readers.clear()
+            reader = _readers[name] = ShmRingReader(name)
+
+        shm_frame = reader.get(frame)
+        if shm_frame is None:
+            return None
+        result = function(shm_frame.data, shm_frame.sample_frequency)
+        return result if shm_frame.valid() else None
+    except Exception:
+        # No error callback in Python 2, a missing result would stall the in order delivery:
+        traceback.print_exc(file=sys.stderr)
+        return None
+
+
+def measure(data, sample_frequency):
+    global _engine
+    if _engine is None:
+        _engine = MeasurementEngine()
+    # Last segment, like AcquisitionBuffer.block:
+    return _engine.measure(data[-1], sample_frequency)
+
+
+class AnalysisPool(object):
+    def __init__(self, function, callback, workers=None, max_pending=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending or PENDING_PER_WORKER * self.workers
+        self.submitted = 0
+        self.delivered = 0
+        self.dropped = 0
+
+        self._function = function
+        self._callback = callback
+        self._pool = multiprocessing.Pool(self.workers, _init_worker)
+        self._ring = None
+        self._generation = 0
+        self._contexts = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, buf, context=None):
+        # Called for every acquisition, frames are dropped while the workers are behind:
+        with self._lock:
+            pending = self.submitted - self.delivered
+            if self._closed or pending >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            if self._ring is None or buf.segments.nbytes > self._ring.slot_size:
+                if pending > 0:
+                    self.dropped += 1
+                    return False
+                self._new_ring(buf.segments.nbytes)
+
+            # A slot is reused after max_pending + 1 frames, by then its result is delivered:
+            self._ring.write(buf)
+            index = self.submitted
+            self.submitted += 1
+            self._contexts[index] = context
+            self._pool.apply_async(_run, (self._function, self._ring.name, self._ring.head), callback=lambda result: self._done(index, result))
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pool.terminate()
+        self._pool.join()
+        if self._ring is not None:
+            self._ring.close()
+
+    def _new_ring(self, size):
+        if self._ring is not None:
+            self._ring.close()
+        self._generation += 1
+        self._ring = ShmRing(RING_NAME.format(os.getpid(), self._generation), size, self.max_pending + 1)
+
+    def _done(self, index, result):
+        # Results arrive in completion order on the pool's result thread, deliver them in submission order:
+        ready = []
+        with self._lock:
+            self._results[index] = result
+            while self.delivered in self._results:
+                ready.append((self._contexts.pop(self.delivered), self._results.pop(self.delivered)))
+                self.delivered += 1
+
+        for context, result in ready:
+            if result is not None:
+                self._callback(context, result)
@@ -0,0 +1,95 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+NONE = 0
+LINEAR = 1
+EXPONENTIAL = 2
+
+
+class Averager(object):
+    def __init__(self):
+        self.mode = NONE
+        self.count = 16
+        self.channels = None
+        # Last finished average, None until there is one:
+        self.result = None
+
+        self._shape = None
+        self._count = 0
+        self._reset = False
+
+    def reset(self):
+        # Called from the GUI thread, applied by the next add() on the acquisition thread:
+        self._reset = True
+
+    def _allocate(self, shape):
+        self._sum = np.empty(shape)
+        self._temp = np.empty(shape)
+        # The GUI may still be drawing the published result, the next one goes in the other buffer:
+        self._results = [np.empty(shape, dtype=np.float32) for i in range(2)]
+        self._shape = shape
+
+    def add(self, channels, block):
+        if block.shape != self._shape or channels != self.channels:
+            self._allocate(block.shape)
+            self._reset = True
+        if self._reset:
+            self._reset = False
+            self._count = 0
+            self.result = None
+            self.channels = channels
+
+        mode = self.mode
+        count = self.count
+        self._count += 1
+        if self._count == 1:
+            self._sum[...] = block
+        elif mode == LINEAR:
+            self._sum += block
+        else:
+            # Cumulative mean until N records are seen, then a moving average with weight 1 / N:
+            np.subtract(block, self._sum, out=self._temp)
+            self._temp *= 1.0 / min(self._count, count)
+            self._sum += self._temp
+
+        if mode == LINEAR and self._count < count:
+            # Only complete sets of N records are published:
+            return False
+
+        result = self._results[1] if self.result is self._results[0] else self._results[0]
+        if mode == LINEAR:
+            np.multiply(self._sum, 1.0 / self._count, out=result, casting="same_kind")
+            self._count = 0
+        else:
+            result[...] = self._sum
+        self.result = result
+        return True
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import sys
+import json
+import time
+import resource
+import threading
+import argparse
+import libtiepiesim
+libtiepiesim.install()
+import numpy as np
+import libtiepie
+import utils
+import decimation
+from acquisition import AcquisitionWorker
+from settings import scope_settings
+from stats import Stats
+from timebase import TimebaseCache
+
+RECORD_LENGTHS = [1000, 10000, 100000, 1000000]
+CHANNEL_COUNTS = [1, 2, 4, 8]
+FRAMES = 50
+PLOT_WIDTH = 800
+
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Renderer(object):
+    def __init__(self, channel_count, qt=False):
+        self._curves = None
+
+        if qt:
+            from PyQt4.QtGui import QApplication, QPixmap
+            import pyqtgraph
+
+            self._app = QApplication.instance() or QApplication(sys.argv)
+            self._grab = QPixmap.grabWidget
+            self._widget = pyqtgraph.GraphicsLayoutWidget()
+            self._widget.resize(PLOT_WIDTH, 600)
+            self._curves = [self._widget.addPlot(i, 0).plot() for i in range(channel_count)]
+
+    def render(self, timebase, data):
+        i = 0
+        for chdata in data:
+            if chdata is not None:
+                x, y = decimation.decimate(timebase, chdata, PLOT_WIDTH)
+                if self._curves is not None:
+                    self._curves[i].setData(y=y, x=x)
+                i += 1
+
+        if self._curves is not None:
+            self._grab(self._widget)
+
+
+def mean_ms(stats, name):
+    histogram = stats.histograms.get(name)
+    return histogram.total / histogram.count * 1e3 if histogram is not None and histogram.count else 0.0
+
+
+def run(scp, fd, record_length, channel_count, frames, renderer):
+    for i in range(len(scp.channels)):
+        scp.channels[i].enabled = i < channel_count
+    scp.record_length = record_length
+    scp.sample_frequency = scp.sample_frequency_max
+
+    # The same path as an oscilloscope window: hub readout and re-arm, a consumer
+    # thread, and the latest frame taken for rendering:
+    stats = Stats()
+    stats.enabled = True
+    ready = threading.Event()
+    worker = AcquisitionWorker(scp, fd, ready.set, stats)
+    worker.settings = scope_settings(scp)
+    worker.consumers.append(lambda buf: stats.increment("consumed"))
+    timebase_cache = TimebaseCache()
+    settings = worker.settings
+
+    worker.start()
+    start = time.time()
+    worker.arm(True)
+    while worker.frames < frames:
+        ready.wait(1)
+        ready.clear()
+        buf = worker.take()
+        if buf is None:
+            continue
+
+        t = stats.time()
+        timebase = timebase_cache.get(buf.length, buf.sample_frequency, settings.pre_sample_ratio)
+        stats.add("timebase", t)
+
+        t = stats.time()
+        renderer.render(timebase, buf.data)
+        stats.add("render", t)
+    elapsed = time.time() - start
+    # No re-arm once the worker is unregistered, stop the scope after it:
+    worker.continuous = False
+    worker.stop()
+    scp.stop()
+
+    return {
+        "record_length": record_length,
+        "channels": channel_count,
+        "acquisitions_per_second": worker.frames / elapsed,
+        "get_data_ms": mean_ms(stats, "get_data"),
+        "arm_ms": mean_ms(stats, "arm"),
+        "dead_time_ms": mean_ms(stats, "dead_time"),
+        "consumers_ms": mean_ms(stats, "consumers"),
+        "timebase_ms": mean_ms(stats, "timebase"),
+        "render_ms": mean_ms(stats, "render"),
+        "skipped": worker.dropped,
+        "buffer_hits": worker.pool.hits,
+        "buffer_reallocations": worker.pool.reallocations,
+        "rss": rss(),
+        "peak_rss": peak_rss(),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Acquisition throughput benchmark, using the simulated libtiepie.")
+    parser.add_argument("--frames", type=int, default=FRAMES, help="acquisitions per configuration")
+    parser.add_argument("--record-lengths", type=int, nargs="+", default=RECORD_LENGTHS)
+    parser.add_argument("--channels", type=int, nargs="+", default=CHANNEL_COUNTS)
+    parser.add_argument("--qt", action="store_true", help="render with pyqtgraph, needs a display")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    item = libtiepie.DeviceListItem(libtiepie.PID_COMBI, "Benchmark", 1, libtiepie.DEVICETYPE_OSCILLOSCOPE, max(args.channels))
+    scp = item.open_oscilloscope()
+    fd = utils.eventfd()
+    scp.set_event_data_ready(fd)
+
+    results = []
+    print("{:>10s} {:>4s} {:>8s} {:>10s} {:>10s} {:>10s} {:>10s} {:>10s} {:>8s} {:>8s} {:>8s} {:>8s}".format("Samples", "Ch", "Acq/s", "Data ms", "Arm ms", "Dead ms", "Time ms", "Render ms", "Skipped", "Realloc", "RSS MB", "Peak MB"))
+    for record_length in args.record_lengths:
+        for channel_count in args.channels:
+            result = run(scp, fd, record_length, channel_count, args.frames, Renderer(channel_count, args.qt))
+            results.append(result)
+            print("{record_length:10d} {channels:4d} {acquisitions_per_second:8.1f} {get_data_ms:10.3f} {arm_ms:10.3f} {dead_time_ms:10.3f} {timebase_ms:10.3f} {render_ms:10.3f} {skipped:8d} {buffer_reallocations:8d}".format(**result) +
+                  " {:8.1f} {:8.1f}".format(result["rss"] / 1e6, result["peak_rss"] / 1e6))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,102 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import os
+import json
+import threading
+
+# 2: record lengths keyed on the segment count:
+CACHE_VERSION = 2
+CACHE_FILE = "capabilities.json"
+
+
+def default_path():
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "libtiepie-ui", CACHE_FILE)
+
+
+class CapabilityCache(object):
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        # Shared by all windows, so the file is read once per run:
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        self.hits = 0
+        self.misses = 0
+
+        self._devices = self._load()
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                return data["devices"]
+        except (IOError, ValueError, KeyError):
+            pass
+        return {}
+
+    def get(self, device, name, config, compute):
+        # Tables are valid for one device and one configuration, e.g. active channels and resolution:
+        tables = self._devices.setdefault("{:d}/{:d}".format(device.product_id, device.serial_number), {})
+        key = name + ":" + json.dumps(config)
+        value = tables.get(key)
+        if value is None:
+            value = compute()
+            tables[key] = value
+            self._dirty = True
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Write and rename, another instance never sees a partial file:
+        filename = self.path + ".tmp"
+        with open(filename, "w") as f:
+            json.dump({"version": CACHE_VERSION, "devices": self._devices}, f)
+        os.rename(filename, self.path)
+        self._dirty = False
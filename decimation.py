@@ -0,0 +1,73 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+OFF = 0
+SUBSAMPLE = 1
+PEAK_DETECT = 2
+
+
+def decimate(x, y, width, mode=PEAK_DETECT, start=0, stop=None):
+    if stop is None:
+        stop = len(y)
+    start = max(start, 0)
+    stop = min(stop, len(y))
+    count = stop - start
+    width = max(int(width), 1)
+
+    if mode == OFF or count <= 2 * width:
+        return x[start:stop], y[start:stop]
+
+    if mode == SUBSAMPLE:
+        step = count // (2 * width)
+        return x[start:stop:step], y[start:stop:step]
+
+    # Peak detect, keep minimum and maximum of each bin, so glitches remain visible:
+    factor = -(-count // width)
+    bins = count // factor
+    end = start + bins * factor
+    blocks = y[start:end].reshape(bins, factor)
+
+    x_out = np.empty(2 * bins + 2, dtype=x.dtype)
+    y_out = np.empty(2 * bins + 2, dtype=y.dtype)
+    x_out[0:2 * bins:2] = x[start:end:factor]
+    x_out[1:2 * bins:2] = x[start + factor - 1:end:factor]
+    blocks.min(axis=1, out=y_out[0:2 * bins:2])
+    blocks.max(axis=1, out=y_out[1:2 * bins:2])
+
+    if end < stop:
+        x_out[-2] = x[end]
+        x_out[-1] = x[stop - 1]
+        y_out[-2] = y[end:stop].min()
+        y_out[-1] = y[end:stop].max()
+        return x_out, y_out
+    else:
+        return x_out[:-2], y_out[:-2]
@@ -30,10 +30,14 @@
 #
 
 from __future__ import print_function
+import sys
+import simulation
+simulation.install_if_requested(sys.argv)
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 import libtiepie
 import utils
+from settings import generator_settings
 
 SIGNAL_TYPES = [
     {"value": libtiepie.ST_SINE, "name": "Sine"},
@@ -168,6 +172,7 @@ class GeneratorUI(QDialog):
 
         self.setLayout(mainLayout)
         self.setWindowTitle(gen.name + " s/n " + str(gen.serial_number))
+        self._update_settings()
         self._update_controls()
         self._frequency.valueChanged.connect(self._frequency_changed)
 
@@ -179,32 +184,40 @@ class GeneratorUI(QDialog):
 
     def _signal_type_changed(self, index):
         self._gen.signal_type = self._signal_type.itemData(index).toInt()[0]
+        self._update_settings()
         self._update_controls()
 
     def _frequency_changed(self, value):
         self._gen.frequency = value
+        self._update_settings()
 
     def _period_changed(self, value):
         self._gen.frequency = 1 / value
+        self._update_settings()
         self._update_width()
 
     def _width_changed(self, value):
         self._gen.width = value
+        self._update_settings()
 
     def _amplitude_changed(self, value):
         self._gen.amplitude = value
+        self._update_settings()
         self._update_offset()
 
     def _offset_changed(self, value):
         self._gen.offset = value
-        if self._gen.signal_type != libtiepie.ST_DC:
+        self._update_settings()
+        if self._settings.signal_type != libtiepie.ST_DC:
             self._update_amplitude()
 
     def _phase_changed(self, value):
         self._gen.phase = value / 360
+        self._update_settings()
 
     def _symmetry_changed(self, value):
         self._gen.symmetry = value / 100
+        self._update_settings()
 
     def _start_clicked(self, value):
         self._gen.start()
@@ -212,20 +225,25 @@ class GeneratorUI(QDialog):
     def _stop_clicked(self, value):
         self._gen.stop()
 
+    def _update_settings(self):
+        # Called by every setter, the controls are updated from this snapshot:
+        self._settings = generator_settings(self._gen)
+
     def _update_controls(self):
-        if self._update_row_visible(ROW_FREQUENCY, (self._gen.signal_type & libtiepie.STM_FREQUENCY) != 0 and self._gen.signal_type != libtiepie.ST_PULSE):
+        signal_type = self._settings.signal_type
+        if self._update_row_visible(ROW_FREQUENCY, (signal_type & libtiepie.STM_FREQUENCY) != 0 and signal_type != libtiepie.ST_PULSE):
             self._update_frequency()
-        if self._update_row_visible(ROW_PERIOD, (self._gen.signal_type & libtiepie.STM_FREQUENCY) != 0 and self._gen.signal_type == libtiepie.ST_PULSE):
+        if self._update_row_visible(ROW_PERIOD, (signal_type & libtiepie.STM_FREQUENCY) != 0 and signal_type == libtiepie.ST_PULSE):
             self._update_period()
-        if self._update_row_visible(ROW_WIDTH, (self._gen.signal_type & libtiepie.STM_WIDTH) != 0):
+        if self._update_row_visible(ROW_WIDTH, (signal_type & libtiepie.STM_WIDTH) != 0):
             self._update_width()
-        if self._update_row_visible(ROW_AMPLITUDE, (self._gen.signal_type & libtiepie.STM_AMPLITUDE) != 0):
+        if self._update_row_visible(ROW_AMPLITUDE, (signal_type & libtiepie.STM_AMPLITUDE) != 0):
             self._update_amplitude()
-        if self._update_row_visible(ROW_OFFSET, (self._gen.signal_type & libtiepie.STM_OFFSET) != 0):
+        if self._update_row_visible(ROW_OFFSET, (signal_type & libtiepie.STM_OFFSET) != 0):
             self._update_offset()
-        if self._update_row_visible(ROW_PHASE, (self._gen.signal_type & libtiepie.STM_PHASE) != 0):
+        if self._update_row_visible(ROW_PHASE, (signal_type & libtiepie.STM_PHASE) != 0):
             self._update_phase()
-        if self._update_row_visible(ROW_SYMMETRY, (self._gen.signal_type & libtiepie.STM_SYMMETRY) != 0):
+        if self._update_row_visible(ROW_SYMMETRY, (signal_type & libtiepie.STM_SYMMETRY) != 0):
             self._update_symmetry()
 
     def _update_row_visible(self, row, visible):
@@ -237,31 +255,31 @@ class GeneratorUI(QDialog):
 
     def _update_frequency(self):
         self._frequency.setRange(self._gen.frequency_min, self._gen.frequency_max)
-        self._frequency.setValue(self._gen.frequency)
+        self._frequency.setValue(self._settings.frequency)
 
     def _update_period(self):
         self._period.setRange(1 / self._gen.frequency_max, 1 / self._gen.frequency_min)
-        self._period.setValue(1 / self._gen.frequency)
+        self._period.setValue(1 / self._settings.frequency)
 
     def _update_width(self):
         self._width.setRange(self._gen.width_min, self._gen.width_max)
-        self._width.setValue(self._gen.width)
+        self._width.setValue(self._settings.width)
 
     def _update_amplitude(self):
         self._amplitude.setRange(self._gen.amplitude_min, self._gen.verify_amplitude(self._gen.amplitude_max))
-        self._amplitude.setValue(self._gen.amplitude)
+        self._amplitude.setValue(self._settings.amplitude)
 
     def _update_offset(self):
         self._offset.setRange(self._gen.verify_offset(self._gen.offset_min), self._gen.verify_offset(self._gen.offset_max))
-        self._offset.setValue(self._gen.offset)
+        self._offset.setValue(self._settings.offset)
 
     def _update_phase(self):
         self._phase.setRange(self._gen.phase_min * 360, self._gen.phase_max * 360)
-        self._phase.setValue(self._gen.phase * 360)
+        self._phase.setValue(self._settings.phase * 360)
 
     def _update_symmetry(self):
         self._symmetry.setRange(self._gen.symmetry_min * 100, self._gen.symmetry_max * 100)
-        self._symmetry.setValue(self._gen.symmetry * 100)
+        self._symmetry.setValue(self._settings.symmetry * 100)
 
 
 if __name__ == '__main__':
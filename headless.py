@@ -0,0 +1,252 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import sys
+import json
+import time
+import struct
+import argparse
+import threading
+import libtiepie
+import utils
+from acquisition import AcquisitionWorker
+from settings import scope_settings
+from server import FrameServer
+import shmring
+
+HEADLESS_FLAG = "--headless"
+
+TRIGGER_KINDS = {
+    "rising": libtiepie.TK_RISINGEDGE,
+    "falling": libtiepie.TK_FALLINGEDGE,
+}
+
+# Fixed size, so the header can be rewritten with the final record count:
+NPY_HEADER_SIZE = 128
+
+
+def npy_header(shape):
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': " + repr(tuple(shape)) + ", }"
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("ascii")
+
+
+class Writer(object):
+    def __init__(self, filename, count=None):
+        self.records = 0
+        self.done = threading.Event()
+
+        self._count = count
+        self._npy = filename.endswith(".npy")
+        self._shape = None
+        self._file = open(filename, "wb")
+        self._lock = threading.Lock()
+
+    def __call__(self, buf):
+        # Runs on the acquisition thread for every acquisition:
+        with self._lock:
+            if self.done.is_set():
+                return
+
+            segments = buf.segments
+            if self._count is not None:
+                segments = segments[:self._count - self.records]
+
+            if self._shape is None:
+                self._shape = segments.shape[1:]
+                if self._npy:
+                    self._file.write(npy_header((0, ) + self._shape))
+            elif segments.shape[1:] != self._shape:
+                raise Exception("Record shape changed during capture")
+
+            segments.tofile(self._file)
+            self.records += len(segments)
+
+            if self._count is not None and self.records >= self._count:
+                self.done.set()
+
+    def close(self):
+        with self._lock:
+            self.done.set()
+            if self._npy and self._shape is not None:
+                self._file.seek(0)
+                self._file.write(npy_header((self.records, ) + self._shape))
+            self._file.close()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog=argv[0] + " " + HEADLESS_FLAG, description="Capture oscilloscope data without a GUI.")
+    parser.add_argument("device", nargs="?", help="product id or serial number, default: first oscilloscope found")
+    parser.add_argument("-o", "--output", help="output file, .npy (records x channels x samples) or raw float32")
+    parser.add_argument("--serve", metavar="ADDRESS", help="publish every acquisition on a Unix socket path or host:port")
+    parser.add_argument("--shm", metavar="NAME", help="write every acquisition to a shared memory ring in " + shmring.SHM_DIR)
+    parser.add_argument("-n", "--count", type=int, help="number of records to capture")
+    parser.add_argument("-d", "--duration", type=float, help="capture duration in seconds")
+    parser.add_argument("--sample-frequency", type=float)
+    parser.add_argument("--record-length", type=int)
+    parser.add_argument("--pre-sample-ratio", type=float)
+    parser.add_argument("--segments", type=int, help="segment count, block mode only")
+    parser.add_argument("--channels", help="enabled channels, e.g. 1,2")
+    parser.add_argument("--range", help="range in V, one value for all or one per enabled channel, e.g. 2,8")
+    parser.add_argument("--trigger", type=int, help="trigger channel")
+    parser.add_argument("--trigger-kind", choices=sorted(TRIGGER_KINDS), default="rising")
+    parser.add_argument("--trigger-level", type=float, help="trigger level in percent")
+    parser.add_argument("--trigger-timeout", type=float, help="trigger time out in seconds, -1 waits forever")
+    args = parser.parse_args([arg for arg in argv[1:] if arg != HEADLESS_FLAG])
+    if args.count is None and args.duration is None:
+        parser.error("--count and/or --duration is required")
+    if args.output is None and args.serve is None and args.shm is None:
+        parser.error("--output, --serve and/or --shm is required")
+    return args
+
+
+def setup(scp, args):
+    scp.measure_mode = libtiepie.MM_BLOCK
+
+    if args.channels is not None:
+        enabled = [int(ch) - 1 for ch in args.channels.split(",")]
+        for i in range(len(scp.channels)):
+            scp.channels[i].enabled = i in enabled
+
+    if args.range is not None:
+        ranges = [float(value) for value in args.range.split(",")]
+        channels = [ch for ch in scp.channels if ch.enabled]
+        for i in range(len(channels)):
+            channels[i].range = ranges[i] if len(ranges) > 1 else ranges[0]
+
+    if args.sample_frequency is not None:
+        scp.sample_frequency = args.sample_frequency
+    if args.record_length is not None:
+        scp.record_length = args.record_length
+    if args.pre_sample_ratio is not None:
+        scp.pre_sample_ratio = args.pre_sample_ratio
+    if args.segments is not None:
+        scp.segment_count = args.segments
+
+    if args.trigger is not None:
+        for i in range(len(scp.channels)):
+            scp.channels[i].trigger.enabled = False
+        for trin in scp.trigger_inputs:
+            trin.enabled = False
+        tr = scp.channels[args.trigger - 1].trigger
+        tr.enabled = True
+        tr.kind = TRIGGER_KINDS[args.trigger_kind]
+        if args.trigger_level is not None:
+            tr.levels[0] = args.trigger_level / 100
+    if args.trigger_timeout is not None:
+        scp.trigger_time_out = libtiepie.TO_INFINITY if args.trigger_timeout < 0 else args.trigger_timeout
+
+
+def main(argv):
+    args = parse_args(argv)
+
+    try:
+        libtiepie.device_list.update()
+        scp = utils.try_open_device(argv[:1] + ([args.device] if args.device else []), libtiepie.DEVICETYPE_OSCILLOSCOPE)
+        setup(scp, args)
+    except Exception, e:
+        print(e, file=sys.stderr)
+        return 1
+
+    settings = scope_settings(scp)
+    writer = Writer(args.output, args.count) if args.output is not None else None
+    done = writer.done if writer is not None else threading.Event()
+
+    fd = utils.eventfd()
+    scp.set_event_data_ready(fd)
+    worker = AcquisitionWorker(scp, fd, lambda: None)
+    worker.settings = settings
+    if writer is not None:
+        # Every record goes to the file, only this scope is serviced by the hub:
+        worker.lossless = True
+        worker.consumers.append(writer)
+
+    server = None
+    if args.serve is not None:
+        server = FrameServer(args.serve)
+        server.start()
+        worker.consumers.append(lambda buf: server.publish(buf, settings))
+
+    ring = None
+    if args.shm is not None:
+        ring = shmring.ShmRing(args.shm, shmring.frame_size(settings))
+        worker.consumers.append(ring.write)
+
+    if writer is None and args.count is not None:
+        def count(buf):
+            if worker.frames + 1 >= args.count:
+                done.set()
+        worker.consumers.append(count)
+
+    worker.start()
+
+    start = time.time()
+    stop = start + args.duration if args.duration is not None else None
+    worker.arm(True)
+    try:
+        while not done.is_set() and (stop is None or time.time() < stop):
+            # Short waits, so Ctrl+C is handled:
+            done.wait(0.1)
+    except KeyboardInterrupt:
+        pass
+    # No re-arm once the worker is unregistered, stop the scope after it:
+    worker.continuous = False
+    worker.stop()
+    scp.stop()
+    duration = time.time() - start
+
+    if server is not None:
+        server.stop()
+        print("{:d} frames published".format(server.sequence), file=sys.stderr)
+    if ring is not None:
+        ring.close()
+        print("{:d} frames written to {:s}".format(ring.frames, ring.path), file=sys.stderr)
+
+    if writer is None:
+        return 0
+    writer.close()
+
+    with open(args.output + ".json", "w") as f:
+        json.dump({
+            "name": scp.name,
+            "serial_number": scp.serial_number,
+            "sample_frequency": settings.sample_frequency,
+            "record_length": settings.record_length,
+            "pre_sample_ratio": settings.pre_sample_ratio,
+            "segment_count": settings.segment_count,
+            "channels": [{"index": i, "range": ch.range, "coupling": ch.coupling} for i, ch in enumerate(settings.channels) if ch.enabled],
+            "records": writer.records,
+            "start": start,
+            "duration": duration,
+        }, f, indent=2)
+
+    print("{:d} records in {:.3f} s, {:.1f} records/s".format(writer.records, duration, writer.records / duration), file=sys.stderr)
+    return 0
@@ -0,0 +1,480 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import os
+import sys
+import math
+import time
+import struct
+import threading
+import ctypes as ct
+import numpy as np
+
+PID_NONE = 0
+PID_COMBI = 2
+PID_HS3 = 13
+PID_HP3 = 14
+PID_HS4 = 15
+PID_HS4D = 20
+PID_HS5 = 22
+
+DEVICETYPE_OSCILLOSCOPE = 1
+DEVICETYPE_GENERATOR = 2
+DEVICETYPE_I2CHOST = 4
+
+CK_DCV = 1
+CK_ACV = 2
+CK_DCA = 4
+CK_ACA = 8
+CK_OHM = 16
+CKM_V = CK_DCV | CK_ACV
+CKM_A = CK_DCA | CK_ACA
+CKM_OHM = CK_OHM
+
+MM_STREAM = 1
+MM_BLOCK = 2
+
+TO_INFINITY = -1
+
+TH_ALLPRESAMPLES = 0xffffffffffffffff
+
+TK_RISINGEDGE = 1
+TK_FALLINGEDGE = 2
+TK_INWINDOW = 4
+TK_OUTWINDOW = 8
+TK_ANYEDGE = 16
+TK_ENTERWINDOW = 32
+TK_EXITWINDOW = 64
+TK_PULSEWIDTHPOSITIVE = 128
+TK_PULSEWIDTHNEGATIVE = 256
+TKM_NONE = 0
+TKM_EDGE = TK_RISINGEDGE | TK_FALLINGEDGE | TK_ANYEDGE
+TKM_WINDOW = TK_INWINDOW | TK_OUTWINDOW | TK_ENTERWINDOW | TK_EXITWINDOW
+TKM_PULSEWIDTH = TK_PULSEWIDTHPOSITIVE | TK_PULSEWIDTHNEGATIVE
+
+TC_NONE = 1
+TC_SMALLER = 2
+TC_LARGER = 4
+TCM_NONE = 0
+TCM_ALL = TC_NONE | TC_SMALLER | TC_LARGER
+
+ST_SINE = 1
+ST_TRIANGLE = 2
+ST_SQUARE = 4
+ST_DC = 8
+ST_NOISE = 16
+ST_ARBITRARY = 32
+ST_PULSE = 64
+STM_AMPLITUDE = ST_SINE | ST_TRIANGLE | ST_SQUARE | ST_NOISE | ST_ARBITRARY | ST_PULSE
+STM_OFFSET = ST_SINE | ST_TRIANGLE | ST_SQUARE | ST_DC | ST_NOISE | ST_ARBITRARY | ST_PULSE
+STM_FREQUENCY = ST_SINE | ST_TRIANGLE | ST_SQUARE | ST_ARBITRARY | ST_PULSE
+STM_PHASE = ST_SINE | ST_TRIANGLE | ST_SQUARE | ST_ARBITRARY
+STM_SYMMETRY = ST_SINE | ST_TRIANGLE | ST_SQUARE
+STM_WIDTH = ST_PULSE
+
+# Channel i shows a sine of this many periods per record, so every channel
+# looks different and the displayed signal is stable:
+SIGNAL_PERIODS = [5, 3, 8, 2, 13, 1, 21, 4]
+
+RANGES = [0.2, 0.4, 0.8, 2, 4, 8, 20, 40, 80]
+
+
+class LibTiePieException(Exception):
+    pass
+
+
+class UnsuccessfulError(LibTiePieException):
+    pass
+
+
+class InvalidDeviceTypeError(LibTiePieException):
+    pass
+
+
+class _Exceptions(object):
+    LibTiePieException = LibTiePieException
+    UnsuccessfulError = UnsuccessfulError
+    InvalidDeviceTypeError = InvalidDeviceTypeError
+
+
+exceptions = _Exceptions()
+
+_handles = {}
+
+
+def _register(obj):
+    handle = len(_handles) + 1
+    _handles[handle] = obj
+    return handle
+
+
+class _Api(object):
+    def HlpPointerArrayNew(self, length):
+        return (ct.c_void_p * length)()
+
+    def HlpPointerArraySet(self, pointers, index, pointer):
+        pointers[index] = pointer
+
+    def HlpPointerArrayDelete(self, pointers):
+        pass
+
+    def ScpGetData(self, handle, pointers, channel_count, start, length):
+        return _handles[handle]._get_data(pointers, channel_count, start, length)
+
+
+api = _Api()
+
+
+class TriggerTimes(list):
+    def verify(self, index, value):
+        return min(max(value, 1e-8), 1e3)
+
+
+class OscilloscopeChannelTrigger(object):
+    def __init__(self):
+        self.enabled = False
+        self.kinds = TKM_EDGE | TKM_WINDOW | TKM_PULSEWIDTH
+        self.kind = TK_RISINGEDGE
+        self.levels = [0.5, 0.5]
+        self.hystereses = [0.05, 0.05]
+        self.conditions = TCM_NONE
+        self.condition = TC_NONE
+        self.times = TriggerTimes([1e-3])
+
+
+class OscilloscopeChannel(object):
+    def __init__(self):
+        self.enabled = True
+        self.couplings = CKM_V
+        self.coupling = CK_DCV
+        self.ranges = list(RANGES)
+        self.auto_ranging = False
+        self.trigger = OscilloscopeChannelTrigger()
+        self._range = 8
+
+    @property
+    def range(self):
+        return self._range
+
+    @range.setter
+    def range(self, value):
+        self._range = min([r for r in self.ranges if r >= value] or [self.ranges[-1]])
+        self.auto_ranging = False
+
+    @property
+    def data_value_min(self):
+        return -self._range
+
+    @property
+    def data_value_max(self):
+        return self._range
+
+
+class TriggerInput(object):
+    def __init__(self, name):
+        self.name = name
+        self.enabled = False
+        self.kinds = TK_RISINGEDGE | TK_FALLINGEDGE
+        self.kind = TK_RISINGEDGE
+
+
+class Device(object):
+    def __init__(self, item):
+        self._item = item
+        self._handle = _register(self)
+        self.name = item.name
+        self.product_id = item.product_id
+        self.serial_number = item.serial_number
+
+
+class Oscilloscope(Device):
+    def __init__(self, item, channel_count, sample_frequency_max=500e6, record_length_max=64 * 1024 * 1024):
+        super(Oscilloscope, self).__init__(item)
+
+        self.channels = [OscilloscopeChannel() for i in range(channel_count)]
+        self.channels[0].trigger.enabled = True
+        self.trigger_inputs = [TriggerInput("EXT 1"), TriggerInput("EXT 2")]
+        self.measure_modes = MM_BLOCK | MM_STREAM
+        self.measure_mode = MM_BLOCK
+        self.sample_frequency_max = sample_frequency_max
+        self.record_length_max = record_length_max
+        self.pre_sample_ratio = 0
+        self.trigger_time_out = 100e-3
+        self.has_trigger_hold_off = True
+        self.trigger_hold_off_count = 0
+        self.segment_count_max = 1024
+        self.segment_count = 1
+
+        self._sample_frequency = 1e6
+        self._record_length = 5000
+        self._fd_data_ready = None
+        self._timer = None
+        self._streamer = None
+        self._running = False
+        self._data_ready = False
+        self._data_overflow = False
+        self._waveforms = {}
+
+    @property
+    def _active_channels(self):
+        return [ch.enabled for ch in self.channels]
+
+    @property
+    def sample_frequency(self):
+        return self._sample_frequency
+
+    @sample_frequency.setter
+    def sample_frequency(self, value):
+        self._sample_frequency = self.verify_sample_frequency(value)
+
+    @property
+    def record_length(self):
+        return self._record_length
+
+    @record_length.setter
+    def record_length(self, value):
+        self._record_length = self.verify_record_length(value)
+
+    @property
+    def is_running(self):
+        return self._running
+
+    @property
+    def is_data_ready(self):
+        return self._data_ready
+
+    @property
+    def is_data_overflow(self):
+        overflow = self._data_overflow
+        self._data_overflow = False
+        return overflow
+
+    def verify_sample_frequency(self, value):
+        # Sample clock is divided down from the maximum sample frequency:
+        divider = max(int(round(self.sample_frequency_max / max(value, 1e-3))), 1)
+        return self.sample_frequency_max / divider
+
+    def verify_record_length(self, value):
+        active_count = max(sum(1 for ch in self.channels if ch.enabled), 1)
+        return int(min(max(value, 1), self.record_length_max // active_count))
+
+    def verify_trigger_time_out(self, value):
+        return min(max(value, 0), 1e3)
+
+    def set_event_data_ready(self, fd):
+        self._fd_data_ready = fd
+
+    def start(self):
+        self.stop()
+        self._running = True
+        self._data_ready = False
+
+        duration = float(self._record_length) / self._sample_frequency
+        if self.measure_mode == MM_STREAM:
+            self._streamer = threading.Thread(target=self._stream, args=(duration,))
+            self._streamer.daemon = True
+            self._streamer.start()
+        else:
+            self._timer = threading.Timer(duration * self.segment_count, self._signal_data_ready)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self):
+        self._running = False
+        if self._timer is not None:
+            self._timer.cancel()
+            # Joined, a cancelled timer still running at exit raises during interpreter shutdown:
+            self._timer.join()
+            self._timer = None
+        if self._streamer is not None:
+            self._streamer.join()
+            self._streamer = None
+
+    def _stream(self, duration):
+        while self._running:
+            time.sleep(duration)
+            if self._running:
+                if self._data_ready:
+                    # Previous chunk was not read in time:
+                    self._data_overflow = True
+                self._signal_data_ready()
+
+    def _signal_data_ready(self):
+        self._data_ready = True
+        if self.measure_mode != MM_STREAM:
+            self._running = False
+        if self._fd_data_ready is not None:
+            os.write(self._fd_data_ready, struct.pack("Q", 1))
+
+    def _waveform(self, index, length):
+        ch = self.channels[index]
+        key = (length, self._record_length, self._sample_frequency, self.pre_sample_ratio, ch.range)
+        waveform = self._waveforms.get(index)
+        if waveform is None or waveform[0] != key:
+            # Sine with a trigger point at the pre sample position plus a little noise:
+            periods = SIGNAL_PERIODS[index % len(SIGNAL_PERIODS)]
+            pre_samples = int(round(self._record_length * self.pre_sample_ratio))
+            n = np.arange(-pre_samples, length - pre_samples, dtype=np.float64)
+            data = 0.8 * ch.range * np.sin(2 * math.pi * periods * n / self._record_length)
+            data += np.random.RandomState(index).normal(0, 0.01 * ch.range, length)
+            waveform = (key, data.astype(np.float32))
+            self._waveforms[index] = waveform
+        return waveform[1]
+
+    def _get_data(self, pointers, channel_count, start, length):
+        length = min(length, self._record_length - start)
+        for i in range(min(channel_count, len(self.channels))):
+            if pointers[i] and self.channels[i].enabled:
+                data = self._waveform(i, self._record_length)
+                ct.memmove(pointers[i], data.ctypes.data + start * 4, length * 4)
+        self._data_ready = False
+        return length
+
+
+class Generator(Device):
+    def __init__(self, item):
+        super(Generator, self).__init__(item)
+
+        self.signal_types = ST_SINE | ST_TRIANGLE | ST_SQUARE | ST_DC | ST_NOISE | ST_ARBITRARY | ST_PULSE
+        self.signal_type = ST_SINE
+        self.output_on = False
+        self.output_invert = False
+        self.frequency_min = 1e-3
+        self.frequency_max = 40e6
+        self.frequency = 1e3
+        self.width_min = 1e-8
+        self.width_max = 1e3
+        self.width = 1e-4
+        self.amplitude_min = 0
+        self.amplitude_max = 12
+        self.amplitude = 1
+        self.offset_min = -12
+        self.offset_max = 12
+        self.offset = 0
+        self.phase_min = 0
+        self.phase_max = 1
+        self.phase = 0
+        self.symmetry_min = 0
+        self.symmetry_max = 1
+        self.symmetry = 0.5
+        self.is_running = False
+
+    def verify_amplitude(self, value):
+        return min(max(value, self.amplitude_min), self.amplitude_max - abs(self.offset))
+
+    def verify_offset(self, value):
+        limit = self.offset_max - self.amplitude
+        return min(max(value, -limit), limit)
+
+    def start(self):
+        self.is_running = True
+
+    def stop(self):
+        self.is_running = False
+
+
+class DeviceListItem(object):
+    def __init__(self, product_id, name, serial_number, types, channel_count=0, sample_frequency_max=500e6):
+        self.product_id = product_id
+        self.name = name
+        self.serial_number = serial_number
+        self.types = types
+        self.channel_count = channel_count
+        self.sample_frequency_max = sample_frequency_max
+
+    def can_open(self, device_type):
+        return (self.types & device_type) != 0
+
+    def open_device(self, device_type):
+        if device_type == DEVICETYPE_OSCILLOSCOPE:
+            return self.open_oscilloscope()
+        elif device_type == DEVICETYPE_GENERATOR:
+            return self.open_generator()
+        else:
+            raise InvalidDeviceTypeError("Invalid device type")
+
+    def open_oscilloscope(self):
+        if not self.can_open(DEVICETYPE_OSCILLOSCOPE):
+            raise InvalidDeviceTypeError("Not an oscilloscope")
+        return Oscilloscope(self, self.channel_count, self.sample_frequency_max)
+
+    def open_generator(self):
+        if not self.can_open(DEVICETYPE_GENERATOR):
+            raise InvalidDeviceTypeError("Not a generator")
+        return Generator(self)
+
+
+class DeviceList(object):
+    def __init__(self):
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def update(self):
+        if not self._items:
+            self._items = [
+                DeviceListItem(PID_HS5, "Handyscope HS5-540XMS", 29001, DEVICETYPE_OSCILLOSCOPE | DEVICETYPE_GENERATOR, 2, 500e6),
+                DeviceListItem(PID_HS4, "Handyscope HS4-50", 29002, DEVICETYPE_OSCILLOSCOPE, 4, 50e6),
+                DeviceListItem(PID_HS4D, "Handyscope HS4 DIFF-50", 29003, DEVICETYPE_OSCILLOSCOPE, 4, 50e6),
+            ]
+
+    def get_item_by_product_id(self, product_id):
+        for item in self._items:
+            if item.product_id == product_id:
+                return item
+        raise UnsuccessfulError("No device with product id: " + str(product_id))
+
+    def get_item_by_serial_number(self, serial_number):
+        for item in self._items:
+            if item.serial_number == serial_number:
+                return item
+        raise UnsuccessfulError("No device with serial number: " + str(serial_number))
+
+    def create_combined_device(self, devices):
+        channel_count = sum(len(dev.channels) for dev in devices)
+        sample_frequency_max = min(dev.sample_frequency_max for dev in devices)
+        serial_number = max(item.serial_number for item in self._items) + 1
+        item = DeviceListItem(PID_COMBI, "Combined instrument", serial_number, DEVICETYPE_OSCILLOSCOPE, channel_count, sample_frequency_max)
+        self._items.append(item)
+        return item
+
+
+device_list = DeviceList()
+
+
+def install():
+    sys.modules["libtiepie"] = sys.modules[__name__]
@@ -30,40 +30,52 @@
 #
 
 from __future__ import print_function
+import time
+startup_time = time.time()
+import sys
+import simulation
+simulation.install_if_requested(sys.argv)
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 import libtiepie
 import utils
+from selectinstrumentsui import SelectInstrumentsUI
 
 
 if __name__ == '__main__':
     import sys
 
-    try:
-        libtiepie.device_list.update()
-
-        dev_count = len(libtiepie.device_list)
+    utils.startup_time = startup_time
+    utils.log_startup("imports")
 
-        if dev_count == 0:
-            raise Exception("No devices found")
-        elif dev_count == 1:
-            app = QApplication(sys.argv)
+    try:
+        app = QApplication(sys.argv)
 
-            parent = QWidget()
-            utils.create_ui(libtiepie.device_list[0], parent)
+        parent = QWidget()
 
-            sys.exit(app.exec_())
-        else:
-            from selectinstrumentsui import SelectInstrumentsUI
+        # Shown right away, discovery runs in the background:
+        ui = SelectInstrumentsUI(parent, True)
+        ui.show()
+        utils.log_startup("select instruments window")
 
-            app = QApplication(sys.argv)
+        def discovery_finished(count, error):
+            if error is not None:
+                print(error, file=sys.stderr)
+                app.exit(1)
+            elif count == 0:
+                print("No devices found", file=sys.stderr)
+                app.exit(1)
+            elif count == 1:
+                ui.open_instruments([libtiepie.device_list[0]])
 
-            parent = QWidget()
+        def instruments_opened(count):
+            if count == 0:
+                app.exit(1)
 
-            ui = SelectInstrumentsUI(parent)
-            ui.show()
+        ui.discovery_finished.connect(discovery_finished)
+        ui.instruments_opened.connect(instruments_opened)
 
-            sys.exit(app.exec_())
+        sys.exit(app.exec_())
     except Exception, e:
         print(e.message, file=sys.stderr)
         sys.exit(1)
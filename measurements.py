@@ -0,0 +1,135 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+LEVEL_LOW = 0.1
+LEVEL_HIGH = 0.9
+
+
+class MeasurementEngine(object):
+    def __init__(self):
+        self._shape = None
+
+    def _allocate(self, shape):
+        # Scratch buffers, reused for every shot with the same shape:
+        self._squares = np.empty(shape, dtype=np.float32)
+        self._states = self._squares.view(np.int32)
+        self._high = np.empty(shape, dtype=np.bool_)
+        self._low = np.empty(shape, dtype=np.bool_)
+        self._index = 2 * np.arange(shape[1], dtype=np.int32) + 1
+        self._shape = shape
+
+    def measure(self, block, sample_frequency):
+        if block.shape != self._shape:
+            self._allocate(block.shape)
+
+        count, length = block.shape
+        minimum = block.min(axis=1).astype(np.float64)
+        maximum = block.max(axis=1).astype(np.float64)
+        vpp = maximum - minimum
+        mean = block.mean(axis=1, dtype=np.float64)
+        np.multiply(block, block, out=self._squares)
+        rms = np.sqrt(self._squares.sum(axis=1, dtype=np.float64) / length)
+
+        # Hysteresis state: the index of the last sample outside the 10..90 %
+        # band is carried forward, encoded as 2 * i + 1 below and 2 * i + 2
+        # above the band, 0 before the first one:
+        low = (minimum + LEVEL_LOW * vpp).astype(np.float32)[:, np.newaxis]
+        high = (minimum + LEVEL_HIGH * vpp).astype(np.float32)[:, np.newaxis]
+        np.greater(block, high, out=self._high)
+        np.less(block, low, out=self._low)
+        np.logical_or(self._low, self._high, out=self._low)
+        states = self._states
+        np.multiply(self._low, self._index, out=states)
+        np.add(states, self._high, out=states)
+        np.maximum.accumulate(states, axis=1, out=states)
+
+        # 1 while below, 0 while above the band (or before the first sample outside it):
+        below = self._high.view(np.int8)
+        np.bitwise_and(states, 1, out=below, casting="unsafe")
+        edges = self._low[:, :-1]
+
+        np.greater(below[:, :-1], below[:, 1:], out=edges)
+        rise_rows, rise_cols = np.nonzero(edges)
+        rise_ends = np.bincount(rise_rows, minlength=count).cumsum()
+
+        np.less(below[:, :-1], below[:, 1:], out=edges)
+        fall_rows, fall_cols = np.nonzero(edges)
+        fall_states = states[fall_rows, fall_cols]
+        # Skip the first entry into the band from the undefined start:
+        valid = fall_states > 0
+        fall_rows, fall_cols, fall_states = fall_rows[valid], fall_cols[valid], fall_states[valid]
+
+        # From the last sample on one side of the band to the first sample on the other side:
+        rise_times = (rise_cols + 1 - (states[rise_rows, rise_cols] >> 1)) / float(sample_frequency)
+        fall_times = (fall_cols + 1 - ((fall_states - 2) >> 1)) / float(sample_frequency)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rise_counts = np.bincount(rise_rows, minlength=count)
+            fall_counts = np.bincount(fall_rows, minlength=count)
+            rise_time = np.bincount(rise_rows, weights=rise_times, minlength=count) / rise_counts
+            fall_time = np.bincount(fall_rows, weights=fall_times, minlength=count) / fall_counts
+
+            # Period from the first to the last rising edge:
+            first = np.zeros(count)
+            last = np.zeros(count)
+            has_rise = rise_counts > 0
+            first[has_rise] = rise_cols[rise_ends[has_rise] - rise_counts[has_rise]]
+            last[has_rise] = rise_cols[rise_ends[has_rise] - 1]
+            span = last - first
+            period = np.where(rise_counts >= 2, span / (rise_counts - 1) / sample_frequency, np.nan)
+
+            # High time of every complete period, from a rising edge to the next falling edge:
+            rise_positions = rise_rows * length + rise_cols
+            fall_positions = fall_rows * length + fall_cols
+            complete = np.ones(len(rise_cols), dtype=np.bool_)
+            complete[rise_ends[has_rise] - 1] = False
+            next_fall = np.searchsorted(fall_positions, rise_positions[complete])
+            next_fall = np.minimum(next_fall, len(fall_positions) - 1)
+            if len(fall_positions):
+                high_times = fall_positions[next_fall] - rise_positions[complete]
+                high_time = np.bincount(rise_rows[complete], weights=high_times, minlength=count)
+            else:
+                high_time = np.zeros(count)
+            duty_cycle = np.where(rise_counts >= 2, 100 * high_time / span, np.nan)
+
+            return {
+                "min": minimum,
+                "max": maximum,
+                "vpp": vpp,
+                "mean": mean,
+                "rms": rms,
+                "period": period,
+                "frequency": 1 / period,
+                "rise_time": rise_time,
+                "fall_time": fall_time,
+                "duty_cycle": duty_cycle,
+            }
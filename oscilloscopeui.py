@@ -30,6 +30,16 @@
 #
 
 from __future__ import print_function
+import os
+import sys
+import json
+import time
+import simulation
+simulation.install_if_requested(sys.argv)
+import headless
+if __name__ == '__main__' and headless.HEADLESS_FLAG in sys.argv:
+    # Capture without a GUI, PyQt4 and pyqtgraph are never imported:
+    sys.exit(headless.main(sys.argv))
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 import pyqtgraph
@@ -37,6 +47,22 @@ import numpy as np
 import ctypes as ct
 import libtiepie
 import utils
+from acquisition import AcquisitionWorker
+from timebase import TimebaseCache
+from ringbuffer import RingBuffer
+from recorder import Recorder
+from stats import Stats
+from settings import scope_settings
+from measurements import MeasurementEngine
+from capabilities import CapabilityCache
+from server import FrameServer
+from shmring import ShmRing, frame_size
+from persistence import Persistence
+from averaging import Averager
+import analysis
+import averaging
+import decimation
+import spectrum
 
 SAMPLE_FREQUENCY_MIN = 50
 
@@ -45,6 +71,17 @@ RECORD_LENGTH_MAX = 1000000
 
 PRE_SAMPLE_RATIOS = range(0, 100, 10)
 
+MEASURE_MODES = [
+    {"value": libtiepie.MM_BLOCK, "name": "Block"},
+    {"value": libtiepie.MM_STREAM, "name": "Stream"},
+]
+
+SEGMENT_COUNTS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+STREAM_WINDOWS = [1, 2, 5, 10, 20, 50]
+STREAM_WINDOW_DEFAULT = 10
+STREAM_BUFFER_MAX = 10000000
+
 COUPLINGS = [
     {"value": libtiepie.CK_DCV, "name": "DCV"},
     {"value": libtiepie.CK_ACV, "name": "ACV"},
@@ -86,14 +123,138 @@ TRIGGER_CONDITIONS = [
 
 LINE_COLORS = ["00ff00", "00ffff", "0000ff", "ff0000", "ff8000", "ff0080", "ffff00", "ff00ff"]
 
+DECIMATION_MODES = [
+    {"value": decimation.PEAK_DETECT, "name": "Peak detect"},
+    {"value": decimation.SUBSAMPLE, "name": "Subsample"},
+    {"value": decimation.OFF, "name": "Off"},
+]
+
+PLOT_WIDTH_DEFAULT = 800
+
+# Instruments with more channels start in stacked mode, one plot row per channel gets too slow:
+STACKED_CHANNEL_COUNT = 8
+STACKED_LANE_HEIGHT = 0.9
+
+AVERAGING_MODES = [
+    {"value": averaging.LINEAR, "name": "{:d} records"},
+    {"value": averaging.EXPONENTIAL, "name": "Exponential 1/{:d}"},
+]
+
+AVERAGING_COUNTS = [2, 4, 8, 16, 32, 64, 128, 256]
+
+SPECTRUM_WINDOWS = [
+    {"value": spectrum.WINDOW_HANN, "name": "Hann"},
+    {"value": spectrum.WINDOW_BLACKMAN_HARRIS, "name": "Blackman-Harris"},
+    {"value": spectrum.WINDOW_FLAT_TOP, "name": "Flat top"},
+    {"value": spectrum.WINDOW_RECTANGULAR, "name": "Rectangular"},
+]
+
+SPECTRUM_AVERAGINGS = [
+    {"value": spectrum.AVERAGING_NONE, "name": "None"},
+    {"value": spectrum.AVERAGING_LINEAR, "name": "Linear"},
+    {"value": spectrum.AVERAGING_EXPONENTIAL, "name": "Exponential"},
+    {"value": spectrum.AVERAGING_PEAK_HOLD, "name": "Peak hold"},
+]
+
+SPECTRUM_AVERAGE_COUNTS = [2, 4, 8, 16, 32, 64]
+
+SPECTRUM_SCALES = [
+    {"value": spectrum.SCALE_DBV, "name": "dBV", "offset": 0},
+    {"value": spectrum.SCALE_DBM, "name": "dBm (50 Ohm)", "offset": spectrum.DBM_OFFSET},
+]
+
+SPECTRUM_DYNAMIC_RANGE = 160
+
+PERSISTENCE_MODES = [
+    {"value": None, "name": "Off"},
+    {"value": 0.5, "name": "Short"},
+    {"value": 0.9, "name": "Medium"},
+    {"value": 0.99, "name": "Long"},
+    {"value": 1.0, "name": "Infinite"},
+]
+
+PERSISTENCE_HEIGHT = 256
+
+FRAME_RATES = [10, 25, 30, 50, 60, 100]
+FRAME_RATE_DEFAULT = 60
+
+STATS_STAGES = [
+    {"value": "latency", "name": "Latency"},
+    {"value": "get_data", "name": "Get data"},
+    {"value": "arm", "name": "Arm"},
+    {"value": "dead_time", "name": "Dead time"},
+    {"value": "consumers", "name": "Consumers"},
+    {"value": "timebase", "name": "Timebase"},
+    {"value": "render", "name": "Render"},
+]
+
+STATS_INTERVAL = 1000
+
+MEASUREMENTS = [
+    {"value": "max", "name": "Max", "unit": "V"},
+    {"value": "min", "name": "Min", "unit": "V"},
+    {"value": "vpp", "name": "Vpp", "unit": "V"},
+    {"value": "mean", "name": "Mean", "unit": "V"},
+    {"value": "rms", "name": "RMS", "unit": "V"},
+    {"value": "frequency", "name": "Frequency", "unit": "Hz"},
+    {"value": "period", "name": "Period", "unit": "s"},
+    {"value": "rise_time", "name": "Rise time", "unit": "s"},
+    {"value": "fall_time", "name": "Fall time", "unit": "s"},
+    {"value": "duty_cycle", "name": "Duty cycle", "unit": "%"},
+]
+
+MEASUREMENTS_INTERVAL = 250
+
+# Measurements in worker processes, 0 measures on the acquisition thread:
+ANALYSIS_WORKERS = [0, 1, 2, 4, 8]
+
 MENU_CHANNEL_RANGE_INDEX = 3
 
+SERVER_ADDRESS = "/tmp/libtiepie-ui-{:d}.sock"
+SHM_NAME = "libtiepie-ui-{:d}"
+
 
 class OscilloscopeUI(QMainWindow):
+    _frame_ready = pyqtSignal()
+
     def __init__(self, scp, parent=None):
         super(OscilloscopeUI, self).__init__(parent)
 
         self._scp = scp
+        self._capability_cache = CapabilityCache.instance()
+        self._menu_values = {}
+        self._timebase_cache = TimebaseCache()
+        self._timebase = None
+        self._timebase_key = None
+        self._data = None
+        self._decimation = decimation.PEAK_DETECT
+        self._stacked = len(scp.channels) > STACKED_CHANNEL_COUNT
+        self._streaming = False
+        self._stream_window = STREAM_WINDOW_DEFAULT
+        self._stream_overruns = 0
+        self._stream_unprocessed = 0
+        self._ring = None
+        self._segment = 0
+        self._overlay = None
+        self._stats = Stats()
+        self._stats_rendered = 0
+        self._stats_time = 0
+        self._stats_frames = 0
+        self._stats_bytes = 0
+        self._stats_saved_calls = 0
+        self._frame_rate = FRAME_RATE_DEFAULT
+        self._render_time = 0
+        self._measurement_engine = MeasurementEngine()
+        self._measuring = False
+        self._measurements = None
+        self._spectrum = spectrum.SpectrumAnalyzer()
+        self._spectrum_enabled = False
+        self._persistence = Persistence(PLOT_WIDTH_DEFAULT, PERSISTENCE_HEIGHT)
+        self._persistence_enabled = False
+        self._averager = Averager()
+        self._server = None
+        self._shm_ring = None
+        self._analysis_pool = None
 
         if scp.has_trigger_hold_off:
             scp.trigger_holf_off_count = libtiepie.TH_ALLPRESAMPLES
@@ -102,10 +263,10 @@ class OscilloscopeUI(QMainWindow):
         self._setup_toolbar()
         self._setup_events()
 
-        glw = pyqtgraph.GraphicsLayoutWidget(self)
-        for i in range(len(scp.channels)):
-            self._setup_plot(glw.addPlot(i, 0))
-        self.setCentralWidget(glw)
+        self.setCentralWidget(pyqtgraph.GraphicsLayoutWidget(self))
+        self._setup_plots()
+        self._setup_stats()
+        self._setup_measurements()
 
         self.setWindowTitle(scp.name + " s/n " + str(scp.serial_number))
         self.resize(800, 600)
@@ -116,13 +277,24 @@ class OscilloscopeUI(QMainWindow):
         # Timebase:
         menu = self.menuBar().addMenu("Timebase")
 
+        submenu = menu.addMenu("Measure mode")
+        act_group = QActionGroup(self)
+        for mm in MEASURE_MODES:
+            if scp.measure_modes & mm["value"] != 0:
+                action = submenu.addAction(mm["name"])
+                action.setCheckable(True)
+                action.setChecked(scp.measure_mode == mm["value"])
+                action.setData(mm["value"])
+                action.toggled.connect(self._measure_mode_changed)
+                act_group.addAction(action)
+
         self._menu_sample_frequency = menu.addMenu("Sample frequency")
         self._menu_sample_frequency_act_group = QActionGroup(self)
 
         self._menu_record_length = menu.addMenu("Record length")
         self._menu_record_length_act_group = QActionGroup(self)
 
-        submenu = menu.addMenu("Pre sample ratio")
+        self._menu_pre_sample_ratio = submenu = menu.addMenu("Pre sample ratio")
         act_group = QActionGroup(self)
         for value in PRE_SAMPLE_RATIOS:
             action = submenu.addAction("{:3.0f} %".format(value))
@@ -137,6 +309,44 @@ class OscilloscopeUI(QMainWindow):
         action.triggered.connect(self._pre_sample_ratio_changed)
         act_group.addAction(action)
 
+        self._menu_segment_count = submenu = menu.addMenu("Segments")
+        act_group = QActionGroup(self)
+        for value in SEGMENT_COUNTS:
+            if value <= scp.segment_count_max:
+                action = submenu.addAction(str(value))
+                action.setCheckable(True)
+                action.setChecked(scp.segment_count == value)
+                action.setData(value)
+                action.toggled.connect(self._segment_count_changed)
+                act_group.addAction(action)
+
+        self._menu_stream_window = submenu = menu.addMenu("Stream window")
+        act_group = QActionGroup(self)
+        for value in STREAM_WINDOWS:
+            action = submenu.addAction(utils.val_to_str(value, 3, 0) + "s")
+            action.setCheckable(True)
+            action.setChecked(self._stream_window == value)
+            action.setData(value)
+            action.toggled.connect(self._stream_window_changed)
+            act_group.addAction(action)
+
+        self._menu_averaging = submenu = menu.addMenu("Averaging")
+        act_group = QActionGroup(self)
+        action = submenu.addAction("Off")
+        action.setCheckable(True)
+        action.setChecked(self._averager.mode == averaging.NONE)
+        action.setData({"mode": averaging.NONE, "count": self._averager.count})
+        action.toggled.connect(self._averaging_changed)
+        act_group.addAction(action)
+        for am in AVERAGING_MODES:
+            submenu.addSeparator()
+            for count in AVERAGING_COUNTS:
+                action = submenu.addAction(am["name"].format(count))
+                action.setCheckable(True)
+                action.setData({"mode": am["value"], "count": count})
+                action.toggled.connect(self._averaging_changed)
+                act_group.addAction(action)
+
         # Channels:
         self._menu_channels = []
         for i in range(len(scp.channels)):
@@ -252,6 +462,86 @@ class OscilloscopeUI(QMainWindow):
             act_group.addAction(action)
             i += 1
 
+        # View:
+        menu = self._menu_view = self.menuBar().addMenu("View")
+
+        submenu = menu.addMenu("Decimation")
+        act_group = QActionGroup(self)
+        for dm in DECIMATION_MODES:
+            action = submenu.addAction(dm["name"])
+            action.setCheckable(True)
+            action.setChecked(self._decimation == dm["value"])
+            action.setData(dm["value"])
+            action.toggled.connect(self._decimation_changed)
+            act_group.addAction(action)
+
+        action = menu.addAction("Stacked channels")
+        action.setCheckable(True)
+        action.setChecked(self._stacked)
+        action.toggled.connect(self._stacked_changed)
+
+        submenu = menu.addMenu("Spectrum")
+        action = submenu.addAction("Show")
+        action.setCheckable(True)
+        action.setChecked(self._spectrum_enabled)
+        action.toggled.connect(self._spectrum_enabled_changed)
+        submenu.addSeparator()
+        for setting, name, items in [("window", "Window", SPECTRUM_WINDOWS),
+                                     ("averaging", "Averaging", SPECTRUM_AVERAGINGS),
+                                     ("average_count", "Averages", [{"value": n, "name": str(n)} for n in SPECTRUM_AVERAGE_COUNTS]),
+                                     ("scale", "Scale", SPECTRUM_SCALES)]:
+            subsubmenu = submenu.addMenu(name)
+            act_group = QActionGroup(self)
+            for item in items:
+                action = subsubmenu.addAction(item["name"])
+                action.setCheckable(True)
+                action.setChecked(getattr(self._spectrum, setting) == item["value"])
+                action.setData({"setting": setting, "value": item["value"]})
+                action.toggled.connect(self._spectrum_setting_changed)
+                act_group.addAction(action)
+
+        submenu = menu.addMenu("Persistence")
+        act_group = QActionGroup(self)
+        for pm in PERSISTENCE_MODES:
+            action = submenu.addAction(pm["name"])
+            action.setCheckable(True)
+            action.setChecked(pm["value"] is None)
+            action.setData(pm["value"])
+            action.toggled.connect(self._persistence_changed)
+            act_group.addAction(action)
+
+        submenu = menu.addMenu("Measurement workers")
+        act_group = QActionGroup(self)
+        for value in ANALYSIS_WORKERS:
+            action = submenu.addAction("{:d} processes".format(value) if value > 0 else "In process")
+            action.setCheckable(True)
+            action.setChecked(value == 0)
+            action.setData(value)
+            action.toggled.connect(self._analysis_workers_changed)
+            act_group.addAction(action)
+
+        submenu = menu.addMenu("Max frame rate")
+        act_group = QActionGroup(self)
+        for value in FRAME_RATES:
+            action = submenu.addAction("{:d} fps".format(value))
+            action.setCheckable(True)
+            action.setChecked(self._frame_rate == value)
+            action.setData(value)
+            action.toggled.connect(self._frame_rate_changed)
+            act_group.addAction(action)
+
+        menu.addSeparator()
+
+        action = menu.addAction("Statistics")
+        action.setCheckable(True)
+        action.toggled.connect(self._statistics_changed)
+
+        action = menu.addAction("Export statistics...")
+        action.triggered.connect(self._export_statistics)
+
+        self._settings = scope_settings(scp, self._trigger_source)
+
+        self._update_measure_mode()
         self._update_sample_frequency()
         self._update_record_length()
         self._update_trigger_source()
@@ -268,18 +558,216 @@ class OscilloscopeUI(QMainWindow):
         self._toolbar_stop = self._toolbar.addAction("Stop")
         self._toolbar_stop.triggered.connect(self._stop)
 
+        self._toolbar_record = self._toolbar.addAction("Record")
+        self._toolbar_record.setCheckable(True)
+        self._toolbar_record.toggled.connect(self._record)
+
+        self._toolbar_serve = self._toolbar.addAction("Serve")
+        self._toolbar_serve.setCheckable(True)
+        self._toolbar_serve.toggled.connect(self._serve_changed)
+
+        self._toolbar_share = self._toolbar.addAction("Share")
+        self._toolbar_share.setCheckable(True)
+        self._toolbar_share.toggled.connect(self._share_changed)
+
+        self._segment_spinbox = QSpinBox()
+        self._segment_spinbox.setPrefix("Segment ")
+        self._segment_spinbox.setSpecialValueText("All segments")
+        self._segment_spinbox.valueChanged.connect(self._segment_changed)
+        self._toolbar_segment = self._toolbar.addWidget(self._segment_spinbox)
+        self._update_segment_count()
+
     def _setup_events(self):
 
         self._fd_dataready = utils.eventfd()
         self._scp.set_event_data_ready(self._fd_dataready)
-        self._notifier_dataready = QSocketNotifier(self._fd_dataready, QSocketNotifier.Read, self)
-        self._notifier_dataready.activated.connect(self._event_dataready)
+        self._worker = AcquisitionWorker(self._scp, self._fd_dataready, self._frame_ready.emit, self._stats)
+        self._worker.consumers.append(self._stream_data)
+        self._worker.consumers.append(self._average)
+        self._worker.consumers.append(self._measure)
+        self._worker.consumers.append(self._persist)
+        self._worker.consumers.append(self._serve)
+        self._worker.consumers.append(self._share)
+        self._update_settings()
+        self._frame_ready.connect(self._schedule_render)
+
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.timeout.connect(self._event_dataready)
+        self._worker.start()
+
+    def closeEvent(self, event):
+        self._stop(False)
+        self._toolbar_record.setChecked(False)
+        self._toolbar_serve.setChecked(False)
+        self._toolbar_share.setChecked(False)
+        self._worker.stop()
+        self._close_analysis_pool()
+        self._capability_cache.save()
+        super(OscilloscopeUI, self).closeEvent(event)
+
+    def _setup_stats(self):
+        self._stats_label = QLabel()
+        self._stats_label.setVisible(False)
+        self.statusBar().addPermanentWidget(self._stats_label)
+
+        self._stats_timer = QTimer(self)
+        self._stats_timer.setInterval(STATS_INTERVAL)
+        self._stats_timer.timeout.connect(self._update_stats)
+
+    def _setup_measurements(self):
+        self._measurements_table = QTableWidget(len(MEASUREMENTS), 0, self)
+        self._measurements_table.setVerticalHeaderLabels([m["name"] for m in MEASUREMENTS])
+        self._measurements_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+        dock = QDockWidget("Measurements", self)
+        dock.setWidget(self._measurements_table)
+        dock.visibilityChanged.connect(self._measurements_visibility_changed)
+        self.addDockWidget(Qt.RightDockWidgetArea, dock)
+        dock.hide()
+        self._menu_view.addAction(dock.toggleViewAction())
+
+        self._measurements_timer = QTimer(self)
+        self._measurements_timer.setInterval(MEASUREMENTS_INTERVAL)
+        self._measurements_timer.timeout.connect(self._update_measurements)
+
+    def _setup_plots(self):
+        glw = self.centralWidget()
+        glw.clear()
+
+        self._plots = {}
+        self._curves = {}
+        self._images = {}
+        self._lanes = {}
+        self._y_ranges = {}
+        self._spectrum_plots = {}
+        self._spectrum_curves = {}
+        self._spectrum_y_ranges = {}
+
+        # Stacked mode: all channels in a single plot, disabled channels are hidden instead of removed:
+        plot = spectrum_plot = None
+        row = 0
+        for i in range(len(self._scp.channels)):
+            if self._stacked or self._scp.channels[i].enabled:
+                if plot is None or not self._stacked:
+                    plot = glw.addPlot(row, 0)
+                    self._setup_plot(plot)
+                    if self._stacked:
+                        plot.sigXRangeChanged.connect(lambda vb, range: self._update_curves())
+                    else:
+                        plot.sigXRangeChanged.connect(lambda vb, range, ch=i: self._update_curve(ch))
+                self._plots[i] = plot
+                self._curves[i] = plot.plot(pen=LINE_COLORS[i % len(LINE_COLORS)])
+
+                if self._persistence_enabled:
+                    color = QColor("#" + LINE_COLORS[i % len(LINE_COLORS)])
+                    image = pyqtgraph.ImageItem()
+                    image.setLookupTable(np.outer(np.linspace(0, 1, 256), color.getRgb()[:3]).astype(np.uint8))
+                    plot.addItem(image)
+                    self._images[i] = image
+                    self._curves[i].setVisible(False)
+
+                if self._spectrum_enabled:
+                    if spectrum_plot is None or not self._stacked:
+                        spectrum_plot = glw.addPlot(row, 1)
+                        self._setup_spectrum_plot(spectrum_plot)
+                    self._spectrum_plots[i] = spectrum_plot
+                    self._spectrum_curves[i] = spectrum_plot.plot(pen=LINE_COLORS[i % len(LINE_COLORS)])
+
+                if not self._stacked:
+                    row += 1
+
+        if self._stacked:
+            self._update_lanes()
 
     def _setup_plot(self, plot):
         time_axis = plot.getAxis('bottom')
         time_axis.enableAutoSIPrefix()
         time_axis.setLabel(units='s')
 
+    def _measure_mode_changed(self, checked):
+        if checked:
+            self._scp.measure_mode = utils.unwrap_QVariant(self.sender().data())
+
+            self._timebase = None
+            self._update_settings()
+            self._update_measure_mode()
+            self._update_sample_frequency()
+            self._update_record_length()
+            self._update_segment_count()
+
+    def _segment_count_changed(self, checked):
+        if checked:
+            self._scp.segment_count = utils.unwrap_QVariant(self.sender().data())
+            self._update_settings()
+            self._update_segment_count()
+            self._update_record_length()
+
+    def _segment_changed(self, value):
+        self._segment = value
+
+    def _stream_window_changed(self, checked):
+        if checked:
+            self._stream_window = utils.unwrap_QVariant(self.sender().data())
+            self._ring = None
+
+    def _averaging_changed(self, checked):
+        if checked:
+            data = utils.unwrap_QVariant(self.sender().data())
+            self._averager.mode = data["mode"]
+            self._averager.count = data["count"]
+            self._averager.reset()
+
+    def _spectrum_enabled_changed(self, checked):
+        self._spectrum_enabled = checked
+        self._spectrum.reset()
+        self._setup_plots()
+
+    def _stacked_changed(self, checked):
+        self._stacked = checked
+        self._setup_plots()
+
+    def _persistence_changed(self, checked):
+        if checked:
+            decay = utils.unwrap_QVariant(self.sender().data())
+            self._persistence.reset()
+            if decay is not None:
+                self._persistence.decay = decay
+            if self._persistence_enabled != (decay is not None):
+                self._persistence_enabled = decay is not None
+                self._setup_plots()
+
+    def _analysis_workers_changed(self, checked):
+        if checked:
+            workers = utils.unwrap_QVariant(self.sender().data())
+            self._close_analysis_pool()
+            if workers > 0:
+                self._analysis_pool = analysis.AnalysisPool(analysis.measure, self._analysis_done, workers)
+
+    def _close_analysis_pool(self):
+        pool = self._analysis_pool
+        self._analysis_pool = None
+        if pool is not None:
+            pool.close()
+            self.statusBar().showMessage("Measured {:d} frames in {:d} processes, {:d} dropped".format(pool.delivered, pool.workers, pool.dropped))
+
+    def _analysis_done(self, channels, result):
+        # Called in acquisition order from the pool's result thread:
+        self._measurements = (channels, result)
+
+    def _spectrum_setting_changed(self, checked):
+        if checked:
+            data = utils.unwrap_QVariant(self.sender().data())
+            setattr(self._spectrum, data["setting"], data["value"])
+            self._spectrum.reset()
+            self._spectrum_y_ranges = {}
+
+    def _setup_spectrum_plot(self, plot):
+        frequency_axis = plot.getAxis('bottom')
+        frequency_axis.enableAutoSIPrefix()
+        frequency_axis.setLabel(units='Hz')
+        plot.getAxis('left').setLabel(SPECTRUM_SCALES[self._spectrum.scale]["name"])
+
     def _sample_frequency_changed(self, checked):
         if checked:
             value = utils.unwrap_QVariant(self.sender().data())
@@ -290,6 +778,8 @@ class OscilloscopeUI(QMainWindow):
             else:
                 self._scp.sample_frequency = value
 
+            self._timebase = None
+            self._update_settings()
             self._update_record_length()
             # TODO: self._update_trigger_time_out()
             self._update_trigger_times()
@@ -304,6 +794,9 @@ class OscilloscopeUI(QMainWindow):
             else:
                 self._scp.record_length = value
 
+            self._timebase = None
+            self._update_settings()
+
     def _pre_sample_ratio_changed(self, checked):
         if checked:
             value = utils.unwrap_QVariant(self.sender().data())
@@ -314,14 +807,23 @@ class OscilloscopeUI(QMainWindow):
             else:
                 self._scp.pre_sample_ratio = value
 
+            self._timebase = None
+            self._update_settings()
+
     def _channel_enabled_changed(self, checked):
         self._scp.channels[utils.unwrap_QVariant(self.sender().data())].enabled = checked
+        self._update_settings()
         self._update_sample_frequency()
+        if self._stacked:
+            self._update_lanes()
+        else:
+            self._setup_plots()
 
     def _channel_coupling_changed(self, checked):
         if checked:
             data = utils.unwrap_QVariant(self.sender().data())
             self._scp.channels[data["ch"]].coupling = data["ck"]
+            self._update_settings()
             self._update_channel_range(data["ch"])
 
     def _channel_range_changed(self, checked):
@@ -331,6 +833,7 @@ class OscilloscopeUI(QMainWindow):
                 self._scp.channels[data["ch"]].auto_ranging = True
             else:
                 self._scp.channels[data["ch"]].range = data["range"]
+            self._update_settings()
 
     def _trigger_timeout_changed(self, checked):
         if checked:
@@ -342,6 +845,7 @@ class OscilloscopeUI(QMainWindow):
                     self._scp.trigger_time_out = value
             else:
                 self._scp.trigger_time_out = value
+            self._update_settings()
 
     def _trigger_source_changed(self, checked):
         data = utils.unwrap_QVariant(self.sender().data())
@@ -354,11 +858,13 @@ class OscilloscopeUI(QMainWindow):
 
         if checked:
             self._trigger_source = tr
+            self._update_settings()
             self._update_trigger_source()
 
     def _trigger_kind_changed(self, checked):
         if checked:
             self._trigger_source.kind = utils.unwrap_QVariant(self.sender().data())
+            self._update_settings()
             self._update_trigger_levels_hystereses_condition_times()
 
     def _trigger_level_changed(self, checked):
@@ -370,6 +876,7 @@ class OscilloscopeUI(QMainWindow):
                     self._trigger_source.levels[data["index"]] = value
             else:
                 self._trigger_source.levels[data["index"]] = data["value"]
+            self._update_settings()
 
     def _trigger_hysteresis_changed(self, checked):
         if checked:
@@ -380,10 +887,12 @@ class OscilloscopeUI(QMainWindow):
                     self._trigger_source.hystereses[data["index"]] = value
             else:
                 self._trigger_source.hystereses[data["index"]] = data["value"]
+            self._update_settings()
 
     def _trigger_condition_changed(self, checked):
         if checked:
             self._trigger_source.condition = utils.unwrap_QVariant(self.sender().data())
+            self._update_settings()
             self._update_trigger_times()
 
     def _trigger_time_changed(self, checked):
@@ -397,12 +906,143 @@ class OscilloscopeUI(QMainWindow):
                     self._trigger_source.times[data["index"]] = value
             else:
                 self._trigger_source.times[data["index"]] = data["value"]
+            self._update_settings()
+
+    def _decimation_changed(self, checked):
+        if checked:
+            self._decimation = utils.unwrap_QVariant(self.sender().data())
+            self._update_curves()
+
+    def _frame_rate_changed(self, checked):
+        if checked:
+            self._frame_rate = utils.unwrap_QVariant(self.sender().data())
+
+    def _statistics_changed(self, checked):
+        self._stats.reset()
+        self._stats.enabled = checked
+        self._stats_rendered = 0
+        self._stats_frames = self._worker.frames
+        self._stats_bytes = self._worker.bytes
+        self._stats_saved_calls = 0
+        self._stats_time = time.time()
+        self._stats_label.setVisible(checked)
+        if checked:
+            self._stats_timer.start()
+        else:
+            self._stats_timer.stop()
+
+    def _export_statistics(self, checked):
+        filename = QFileDialog.getSaveFileName(self, "Export statistics", "statistics.json", "JSON (*.json)")
+        if filename:
+            data = self._stats.to_dict()
+            data["frames"] = self._worker.frames
+            data["dropped"] = self._worker.dropped
+            data["unprocessed"] = self._worker.unprocessed
+            data["bytes"] = self._worker.bytes
+            data["capabilities"] = {"hits": self._capability_cache.hits, "misses": self._capability_cache.misses}
+            data["buffers"] = {"hits": self._worker.pool.hits, "reallocations": self._worker.pool.reallocations}
+            with open(str(filename), "w") as f:
+                json.dump(data, f, indent=2)
+
+    def _update_stats(self):
+        now = time.time()
+        rendered = self._stats.counters.get("rendered", 0)
+        frames = self._worker.frames
+        byte_count = self._worker.bytes
+        saved_calls = self._stats.counters.get("saved_calls", 0)
+        interval = now - self._stats_time
+        fps = (rendered - self._stats_rendered) / interval
+        acquisitions = (frames - self._stats_frames) / interval
+        throughput = (byte_count - self._stats_bytes) / interval
+        saved_calls_rate = (saved_calls - self._stats_saved_calls) / interval
+        self._stats_rendered = rendered
+        self._stats_frames = frames
+        self._stats_bytes = byte_count
+        self._stats_saved_calls = saved_calls
+        self._stats_time = now
+
+        text = "{:.1f} fps  {:.1f} acq/s  {:s}B/s".format(fps, acquisitions, utils.val_to_str(throughput, 4, 1))
+        for stage in STATS_STAGES:
+            histogram = self._stats.histograms.get(stage["value"])
+            if histogram is not None:
+                text += "  {:s} {:s}s/{:s}s".format(stage["name"], utils.val_to_str(histogram.percentile(50), 4, 1), utils.val_to_str(histogram.percentile(99), 4, 1))
+        text += "  Skipped {:d}  Unprocessed {:d}  Saved calls ~{:.0f}/s (estimate)".format(self._worker.dropped, self._worker.unprocessed, saved_calls_rate)
+        self._stats_label.setText(text)
+
+    def _measurements_visibility_changed(self, visible):
+        self._measuring = visible
+        if visible:
+            self._measurements_timer.start()
+        else:
+            self._measurements_timer.stop()
+
+    def _update_measurements(self):
+        measurements = self._measurements
+        if measurements is None:
+            return
+
+        channels, results = measurements
+        indices = [i for i in range(len(channels)) if channels[i]]
+        table = self._measurements_table
+        if table.columnCount() != len(indices):
+            table.setColumnCount(len(indices))
+        table.setHorizontalHeaderLabels(["Ch" + str(i + 1) for i in indices])
+
+        for row in range(len(MEASUREMENTS)):
+            m = MEASUREMENTS[row]
+            values = results[m["value"]]
+            for column in range(len(indices)):
+                value = values[column]
+                item = table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    table.setItem(row, column, item)
+                item.setText("-" if np.isnan(value) else utils.val_to_str(value) + m["unit"])
+
+    def _update_settings(self):
+        # Called by every setter, the acquisition and render paths and the menus only read this snapshot:
+        self._settings = scope_settings(self._scp, self._trigger_source)
+        self._worker.settings = self._settings
+        self._spectrum.reset()
+        self._persistence.reset()
+        self._averager.reset()
+
+    def _update_measure_mode(self):
+        self._streaming = self._scp.measure_mode == libtiepie.MM_STREAM
+        self._menu_record_length.menuAction().setText("Chunk size" if self._streaming else "Record length")
+        self._menu_pre_sample_ratio.menuAction().setVisible(not self._streaming)
+        self._menu_stream_window.menuAction().setVisible(self._streaming)
+        self._menu_averaging.menuAction().setVisible(not self._streaming)
+        self._menu_segment_count.menuAction().setVisible(not self._streaming and self._scp.segment_count_max > 1)
+
+    def _capabilities(self, name, config, compute):
+        return self._capability_cache.get(self._scp, name, config, compute)
+
+    def _capability_config(self):
+        # Sample frequency and record length limits depend on these:
+        scp = self._scp
+        return [scp.measure_mode, list(scp._active_channels), getattr(scp, "resolution", 0)]
+
+    def _update_menu_values(self, menu, values, checked):
+        if self._menu_values.get(menu) == values:
+            # Same table, only the current value changed, update the check marks without rebuilding the menu:
+            for action in menu.actions():
+                action.blockSignals(True)
+                action.setChecked(checked(utils.unwrap_QVariant(action.data())))
+                action.blockSignals(False)
+            return False
+        self._menu_values[menu] = values
+        menu.clear()
+        return True
 
     def _update_sample_frequency(self):
         sample_frequency = self._scp.sample_frequency
         menu = self._menu_sample_frequency
-        menu.clear()
-        for value in reversed(utils.sequence_125(SAMPLE_FREQUENCY_MIN, self._scp.verify_sample_frequency(1e100))):
+        values = self._capabilities("sample_frequencies", self._capability_config(),
+                                    lambda: list(reversed(utils.sequence_125(SAMPLE_FREQUENCY_MIN, self._scp.verify_sample_frequency(1e100)))))
+        if not self._update_menu_values(menu, values, lambda value: value == sample_frequency):
+            return
+        for value in values:
             action = menu.addAction(utils.val_to_str(value, 3, 0) + "Hz")
             action.setCheckable(True)
             action.setChecked(sample_frequency == value)
@@ -416,10 +1056,16 @@ class OscilloscopeUI(QMainWindow):
         self._menu_sample_frequency_act_group.addAction(action)
 
     def _update_record_length(self):
-        record_length = self._scp.record_length
+        scp = self._scp
+        record_length = scp.record_length
         menu = self._menu_record_length
-        menu.clear()
-        for value in reversed(utils.sequence_125(self._scp.verify_record_length(RECORD_LENGTH_MIN), self._scp.verify_record_length(RECORD_LENGTH_MAX))):
+        # The maximum record length also depends on the segment count:
+        segment_count = scp.segment_count if scp.measure_mode == libtiepie.MM_BLOCK else 1
+        values = self._capabilities("record_lengths", self._capability_config() + [segment_count],
+                                    lambda: [int(value) for value in reversed(utils.sequence_125(self._scp.verify_record_length(RECORD_LENGTH_MIN), self._scp.verify_record_length(RECORD_LENGTH_MAX)))])
+        if not self._update_menu_values(menu, values, lambda value: value == record_length):
+            return
+        for value in values:
             action = menu.addAction(utils.val_to_str(value, 3, 0) + "Samples")
             action.setCheckable(True)
             action.setChecked(record_length == value)
@@ -432,6 +1078,11 @@ class OscilloscopeUI(QMainWindow):
         action.triggered.connect(self._record_length_changed)
         self._menu_record_length_act_group.addAction(action)
 
+    def _update_segment_count(self):
+        segment_count = self._scp.segment_count
+        self._segment_spinbox.setRange(0, segment_count)
+        self._toolbar_segment.setVisible(segment_count > 1 and not self._streaming)
+
     def _update_channel_range(self, index):
         ch = self._scp.channels[index]
         menu_ch = self._menu_channels[index]
@@ -439,7 +1090,17 @@ class OscilloscopeUI(QMainWindow):
         if len(items) > MENU_CHANNEL_RANGE_INDEX:
             menu = items[MENU_CHANNEL_RANGE_INDEX]
 
-            menu.clear()
+            ck = ch.coupling
+            if ck & libtiepie.CKM_V != 0:
+                unit = "V"
+            elif ck & libtiepie.CKM_A != 0:
+                unit = "A"
+            elif ck & libtiepie.CKM_OHM != 0:
+                unit = "Ohm"
+
+            values = self._capabilities("ranges", [index, ck], lambda: list(reversed(ch.ranges)))
+            if not self._update_menu_values(menu, (unit, values), lambda data: data["range"] is None if ch.auto_ranging else data["range"] == ch.range):
+                return
 
             action = menu.addAction("Auto")
             action.setCheckable(True)
@@ -448,15 +1109,7 @@ class OscilloscopeUI(QMainWindow):
             action.toggled.connect(self._channel_range_changed)
             menu_ch["range_action_group"].addAction(action)
 
-            ck = self._scp.channels[index].coupling
-            if ck & libtiepie.CKM_V != 0:
-                unit = "V"
-            elif ck & libtiepie.CKM_A != 0:
-                unit = "A"
-            elif ck & libtiepie.CKM_OHM != 0:
-                unit = "Ohm"
-
-            for value in reversed(self._scp.channels[index].ranges):
+            for value in values:
                 action = menu.addAction(utils.val_to_str(value, 3, 0) + unit)
                 action.setCheckable(True)
                 action.setChecked(not ch.auto_ranging and ch.range == value)
@@ -469,7 +1122,7 @@ class OscilloscopeUI(QMainWindow):
         self._update_trigger_levels_hystereses_condition_times()
 
     def _update_trigger_kind(self):
-        tr = self._trigger_source
+        tr = self._settings.trigger
         self._menu_trigger_kind.menuAction().setVisible(tr.kinds != libtiepie.TKM_NONE)
         if self._menu_trigger_kind.menuAction().isVisible():
             self._menu_trigger_kind.clear()
@@ -483,8 +1136,8 @@ class OscilloscopeUI(QMainWindow):
                     self._menu_trigger_kind_act_group.addAction(action)
 
     def _update_trigger_levels_hystereses_condition_times(self):
-        tr = self._trigger_source
-        level_count = len(tr.levels) if hasattr(tr, 'levels') else 0
+        tr = self._settings.trigger
+        level_count = len(tr.levels)
         for i in range(len(self._menu_trigger_levels)):
             menu = self._menu_trigger_levels[i]
             menu.menuAction().setVisible(level_count > i)
@@ -493,7 +1146,7 @@ class OscilloscopeUI(QMainWindow):
                 for action in menu.actions():
                     action.setChecked(utils.unwrap_QVariant(action.data())["value"] == value)
 
-        hysteresis_count = len(tr.hystereses) if hasattr(tr, 'hystereses') else 0
+        hysteresis_count = len(tr.hystereses)
         for i in range(len(self._menu_trigger_hystereses)):
             menu = self._menu_trigger_hystereses[i]
             menu.menuAction().setVisible(hysteresis_count > i)
@@ -502,7 +1155,7 @@ class OscilloscopeUI(QMainWindow):
                 for action in menu.actions():
                     action.setChecked(utils.unwrap_QVariant(action.data())["value"] == value)
 
-        self._menu_trigger_condition.menuAction().setVisible(hasattr(tr, 'conditions') and tr.conditions != libtiepie.TCM_NONE)
+        self._menu_trigger_condition.menuAction().setVisible(tr.conditions != libtiepie.TCM_NONE)
         if self._menu_trigger_condition.menuAction().isVisible():
             self._menu_trigger_condition.clear()
             for tc in TRIGGER_CONDITIONS:
@@ -517,14 +1170,16 @@ class OscilloscopeUI(QMainWindow):
         self._update_trigger_times()
 
     def _update_trigger_times(self):
-        tr = self._trigger_source
-        time_count = len(tr.times) if hasattr(tr, 'times') else 0
+        tr = self._settings.trigger
+        time_count = len(tr.times)
         for i in range(len(self._menu_trigger_times)):
             menu = self._menu_trigger_times[i]
             menu.menuAction().setVisible(time_count > i)
             if menu.menuAction().isVisible():
-                menu.clear()
-                for value in utils.sequence_125(tr.times.verify(i, 1e-100), 1):
+                values = self._capabilities("trigger_times", [i, self._settings.sample_frequency], lambda: utils.sequence_125(self._trigger_source.times.verify(i, 1e-100), 1))
+                if not self._update_menu_values(menu, values, lambda data: data["value"] == tr.times[i]):
+                    continue
+                for value in values:
                     action = menu.addAction(utils.val_to_str(value, 3, 0) + "s")
                     action.setCheckable(True)
                     action.setChecked(tr.times[i] == value)
@@ -544,68 +1199,348 @@ class OscilloscopeUI(QMainWindow):
         self._do_start(False)
 
     def _do_start(self, continuous):
-        self._continuous = continuous
-        self._sample_frequency = self._scp.sample_frequency
-        self._scp.start()
+        if self._streaming:
+            # The scope keeps streaming until it is stopped, no re-arm needed:
+            continuous = False
+            self._ring = None
+            self._stream_overruns = 0
+            self._stream_unprocessed = self._worker.unprocessed
+        self._worker.arm(continuous)
 
     def _stop(self, checked):
-        self._continuous = False
         try:
-            self._scp.stop()
+            self._worker.disarm()
         except libtiepie.exceptions.UnsuccessfulError:
             pass
 
-    def _event_dataready(self, fd):
-        utils.eventfd_clear(fd)
-
+    def _record(self, checked):
+        if checked:
+            path = QFileDialog.getExistingDirectory(self, "Record to")
+            if not path:
+                self._toolbar_record.setChecked(False)
+                return
+
+            path = os.path.join(str(path), time.strftime("capture-%Y%m%d-%H%M%S"))
+            os.makedirs(path)
+            self._worker.recorder = Recorder(path, self._recording_metadata())
+        else:
+            recorder = self._worker.recorder
+            self._worker.recorder = None
+            if recorder is not None:
+                recorder.close()
+                self.statusBar().showMessage("Recorded {:d} frames to {:s}".format(recorder.frames, recorder.path))
+
+    def _serve_changed(self, checked):
+        if checked:
+            address, ok = QInputDialog.getText(self, "Serve", "Unix socket path or host:port:", text=SERVER_ADDRESS.format(self._scp.serial_number))
+            if not ok:
+                self._toolbar_serve.setChecked(False)
+                return
+
+            try:
+                self._server = FrameServer(str(address))
+            except Exception, e:
+                QMessageBox.warning(self, "Serve", str(e))
+                self._toolbar_serve.setChecked(False)
+                return
+            self._server.start()
+            self.statusBar().showMessage("Serving on " + self._server.address)
+        else:
+            server = self._server
+            self._server = None
+            if server is not None:
+                server.stop()
+                self.statusBar().showMessage("Published {:d} frames".format(server.sequence))
+
+    def _share_changed(self, checked):
+        if checked:
+            name, ok = QInputDialog.getText(self, "Share", "Shared memory name:", text=SHM_NAME.format(self._scp.serial_number))
+            if not ok:
+                self._toolbar_share.setChecked(False)
+                return
+
+            try:
+                # Slots fit the current settings, larger frames are skipped:
+                self._shm_ring = ShmRing(str(name), frame_size(self._settings))
+            except Exception, e:
+                QMessageBox.warning(self, "Share", str(e))
+                self._toolbar_share.setChecked(False)
+                return
+            self.statusBar().showMessage("Sharing in " + self._shm_ring.path)
+        else:
+            ring = self._shm_ring
+            self._shm_ring = None
+            if ring is not None:
+                ring.close()
+                self.statusBar().showMessage("Shared {:d} frames, {:d} skipped".format(ring.frames, ring.skipped))
+
+    def _recording_metadata(self):
         scp = self._scp
-        channel_count = len(scp.channels)
-
-        start = 0
-        length = scp._record_length - start
+        return {
+            "name": scp.name,
+            "serial_number": scp.serial_number,
+            "measure_mode": scp.measure_mode,
+            "sample_frequency": scp.sample_frequency,
+            "record_length": scp.record_length,
+            "pre_sample_ratio": scp.pre_sample_ratio,
+            "segment_count": self._worker.settings.segment_count,
+            "channels": [{"enabled": ch.enabled, "range": ch.range, "coupling": ch.coupling} for ch in scp.channels],
+        }
+
+    def _schedule_render(self):
+        # Acquisitions keep flowing into the latest frame slot, render at most at the frame rate:
+        if not self._render_timer.isActive():
+            delay = 1000.0 / self._frame_rate - (time.time() - self._render_time) * 1000
+            self._render_timer.start(max(int(delay), 0))
+
+    def _event_dataready(self):
+        buf = self._worker.take()
+        if buf is None:
+            return
+
+        self._render_time = time.time()
 
-        # Get data
-        pointers = libtiepie.api.HlpPointerArrayNew(channel_count)
-        data = [None for i in range(channel_count)]
-
-        try:
-            for i in range(channel_count):
-                if scp._active_channels[i]:
-                    data[i] = np.empty(length, dtype=np.float32)
-                    libtiepie.api.HlpPointerArraySet(pointers, i, data[i].ctypes.data)
-
-            libtiepie.api.ScpGetData(scp._handle, pointers, channel_count, start, length)
-        finally:
-            libtiepie.api.HlpPointerArrayDelete(pointers)
+        scp = self._scp
+        settings = self._settings
+        stats = self._stats
+        ring = self._ring
+        saved_calls = 0
+
+        overlay = None
+        averaged = self._averager.result
+        if self._streaming and ring is not None:
+            # Scrolling window, the latest sample is at t = 0:
+            data = ring.latest()
+            length = ring.capacity
+            # Chunks skipped because the consumers fell behind are gaps in the display too:
+            skipped = self._worker.unprocessed - self._stream_unprocessed
+            self.statusBar().showMessage("Chunks: {:d}  Overruns: {:d}  Skipped: {:d}".format(self._worker.frames, self._stream_overruns, skipped))
+        elif self._averager.mode != averaging.NONE and averaged is not None and self._averager.channels == buf.channels and averaged.shape == buf.block.shape:
+            # The consumer thread may already average newer settings, only draw a result that matches this frame:
+            data = self._channel_data(buf.channels, averaged)
+            length = buf.length
+        elif buf.segment_count > 1:
+            # Browse a single segment, or overlay all of them:
+            segment = min(self._segment, buf.segment_count)
+            if segment:
+                data = self._channel_data(buf.channels, buf.segments[segment - 1])
+            else:
+                data = buf.data
+                overlay = buf.segments
+            length = buf.length
+        else:
+            data = buf.data
+            length = buf.length
 
         # Plot data
-        glw = self.centralWidget()
-
-        timebase = np.linspace(0, scp._record_length / self._sample_frequency, scp._record_length, endpoint=False)
-
-        i = 0
-        for chnum, chdata in zip(range(len(self._scp.channels)), data):
-            if chdata is not None:
-                plot = glw.getItem(i, 0)
-                if plot:
-                    plot.clear()
+        t = stats.time()
+        timebase_key = (length, buf.sample_frequency, self._streaming)
+        if self._timebase is None or self._timebase_key != timebase_key:
+            pre_sample_ratio = 1 if self._streaming else settings.pre_sample_ratio
+            self._timebase = self._timebase_cache.get(length, buf.sample_frequency, pre_sample_ratio)
+            self._timebase_key = timebase_key
+        stats.add("timebase", t)
+
+        t = stats.time()
+        self._data = data
+        self._overlay = overlay
+        self._overlay_rows = self._channel_data(buf.channels, range(len(buf.block)))
+
+        for chnum, chdata in enumerate(data):
+            if chdata is not None and chnum in self._curves:
+                self._update_curve(chnum)
+
+                ch = settings.channels[chnum]
+                if ch.auto_ranging:
+                    # Range changes without a setter, read it from the library:
+                    y_range = (scp.channels[chnum].data_value_min, scp.channels[chnum].data_value_max)
                 else:
-                    plot = glw.addPlot(i, 0)
-                    self._setup_plot(plot)
-                ch = self._scp.channels[chnum]
-                plot.plot(y=chdata, x=timebase, pen=LINE_COLORS[chnum % len(LINE_COLORS)])
-                plot.setYRange(ch.data_value_min, ch.data_value_max)
-
-                i += 1
-
-        # Remove unused plots:
-        plot = glw.getItem(i, 0)
-        while plot is not None:
-            glw.removeItem(plot)
-            plot = glw.getItem(i, 0)
-
-        if self._continuous:
-            self._do_start(self._continuous)
+                    y_range = (ch.data_value_min, ch.data_value_max)
+                    saved_calls += 2
+                if self._y_ranges.get(chnum) != y_range:
+                    self._y_ranges[chnum] = y_range
+                    if self._stacked:
+                        self._update_lanes()
+                    else:
+                        self._plots[chnum].setYRange(*y_range)
+                    self._persistence.reset()
+
+        if self._persistence_enabled:
+            self._update_persistence()
+
+        if self._spectrum_enabled:
+            self._update_spectrum(buf)
+
+        stats.add("render", t)
+        stats.increment("rendered")
+        stats.increment("saved_calls", saved_calls)
+
+    def _stream_data(self, buf):
+        if not self._streaming:
+            return
+
+        ring = self._ring
+        if ring is None or ring.channels != buf.channels:
+            capacity = min(int(self._stream_window * buf.sample_frequency), STREAM_BUFFER_MAX)
+            ring = RingBuffer(buf.channels, max(capacity, buf.length))
+            self._ring = ring
+
+        ring.append(buf.data, buf.length)
+
+        if self._scp.is_data_overflow:
+            self._stream_overruns += 1
+
+    def _average(self, buf):
+        if self._averager.mode != averaging.NONE and not self._streaming and buf.block is not None:
+            for block in buf.segments:
+                self._averager.add(buf.channels, block)
+
+    def _channel_data(self, channels, rows):
+        data = [None] * len(channels)
+        j = 0
+        for chnum in range(len(data)):
+            if channels[chnum]:
+                data[chnum] = rows[j]
+                j += 1
+        return data
+
+    def _serve(self, buf):
+        server = self._server
+        if server is not None:
+            server.publish(buf, self._settings)
+
+    def _share(self, buf):
+        ring = self._shm_ring
+        if ring is not None:
+            ring.write(buf)
+
+    def _measure(self, buf):
+        if self._measuring and buf.block is not None:
+            pool = self._analysis_pool
+            if pool is not None:
+                pool.submit(buf, buf.channels)
+            else:
+                self._measurements = (buf.channels, self._measurement_engine.measure(buf.block, buf.sample_frequency))
+
+    def _persist(self, buf):
+        if not self._persistence_enabled or self._streaming or buf.block is None:
+            return
+
+        # Y ranges are taken from the rendered plots, frames before the first render are skipped:
+        indices = [i for i in range(len(buf.channels)) if buf.channels[i]]
+        y_ranges = [self._y_ranges.get(i) for i in indices]
+        if None not in y_ranges:
+            for block in buf.segments:
+                self._persistence.add(buf.channels, block, [r[0] for r in y_ranges], [r[1] for r in y_ranges])
+
+    def _update_persistence(self):
+        persistence = self._persistence
+        image = persistence.image
+        if image is None or self._timebase is None:
+            return
+
+        t0 = self._timebase[0]
+        t1 = self._timebase[-1]
+
+        j = 0
+        for chnum in range(len(persistence.channels)):
+            if persistence.channels[chnum]:
+                if chnum in self._images:
+                    y_min, y_max = self._y_ranges[chnum]
+                    transform = QTransform()
+                    transform.translate(t0, y_min)
+                    transform.scale((t1 - t0) / persistence.width, (y_max - y_min) / persistence.height)
+                    if chnum in self._lanes:
+                        transform *= self._lanes[chnum]
+                    self._images[chnum].setImage(image[j], autoLevels=False, levels=(0, max(image[j].max(), 1)))
+                    self._images[chnum].setTransform(transform)
+                j += 1
+
+    def _update_spectrum(self, buf):
+        # Runs on the GUI thread for rendered frames only, acquisition continues in the worker:
+        frequencies, result = self._spectrum.process(buf.block, buf.sample_frequency)
+        offset = SPECTRUM_SCALES[self._spectrum.scale]["offset"]
+
+        tops = {}
+        j = 0
+        for chnum in range(len(buf.channels)):
+            if buf.channels[chnum]:
+                if chnum in self._spectrum_curves:
+                    plot = self._spectrum_plots[chnum]
+                    width = int(plot.getViewBox().width()) or PLOT_WIDTH_DEFAULT
+                    x, y = decimation.decimate(frequencies, result[j], width)
+                    self._spectrum_curves[chnum].setData(y=y, x=x)
+
+                    # Top of the display at the full scale of the channel range, stacked
+                    # channels share one plot which fits the largest range:
+                    top = 20 * np.log10(self._y_ranges[chnum][1] / np.sqrt(2)) + offset + 10
+                    tops[plot] = max(tops.get(plot, top), top)
+                j += 1
+
+        for plot, top in tops.items():
+            if self._spectrum_y_ranges.get(plot) != top:
+                plot.setYRange(top - SPECTRUM_DYNAMIC_RANGE, top)
+                plot.getAxis('left').setLabel(SPECTRUM_SCALES[self._spectrum.scale]["name"])
+                self._spectrum_y_ranges[plot] = top
+
+    def _update_lanes(self):
+        # Each enabled channel is scaled from its range into a lane of height one, top to bottom:
+        enabled = [i for i in sorted(self._curves) if self._scp.channels[i].enabled]
+        ticks = []
+        for i in self._curves:
+            self._curves[i].setVisible(i in enabled and not self._persistence_enabled)
+            if i in self._images:
+                self._images[i].setVisible(i in enabled)
+            if i in self._spectrum_curves:
+                self._spectrum_curves[i].setVisible(i in enabled)
+
+        for k, i in enumerate(enabled):
+            lane = len(enabled) - 1 - k
+            y_min, y_max = self._y_ranges.get(i, (-1, 1))
+            transform = QTransform()
+            transform.translate(0, lane)
+            transform.scale(1, STACKED_LANE_HEIGHT / (y_max - y_min))
+            transform.translate(0, -0.5 * (y_min + y_max))
+            self._lanes[i] = transform
+            self._curves[i].setTransform(transform)
+            ticks.append((lane, "Ch" + str(i + 1)))
+
+        if enabled:
+            plot = self._plots[enabled[0]]
+            plot.setYRange(-0.5, len(enabled) - 0.5)
+            plot.getAxis('left').setTicks([ticks])
+
+    def _update_curves(self):
+        for chnum in self._curves:
+            self._update_curve(chnum)
+
+    def _update_curve(self, chnum):
+        timebase = self._timebase
+        if timebase is None or self._data is None or self._data[chnum] is None:
+            return
+
+        vb = self._plots[chnum].getViewBox()
+        width = int(vb.width()) or PLOT_WIDTH_DEFAULT
+
+        if vb.autoRangeEnabled()[0]:
+            start, stop = 0, len(timebase)
+        else:
+            x_min, x_max = vb.viewRange()[0]
+            start = np.searchsorted(timebase, x_min) - 1
+            stop = np.searchsorted(timebase, x_max) + 1
+
+        if self._overlay is not None:
+            # All segments in one curve, separated by NaNs:
+            row = self._overlay_rows[chnum]
+            xs, ys = [], []
+            for block in self._overlay:
+                x, y = decimation.decimate(timebase, block[row], width, self._decimation, start, stop)
+                xs += [x, [np.nan]]
+                ys += [y, [np.nan]]
+            self._curves[chnum].setData(y=np.concatenate(ys), x=np.concatenate(xs), connect="finite")
+        else:
+            x, y = decimation.decimate(timebase, self._data[chnum], width, self._decimation, start, stop)
+            self._curves[chnum].setData(y=y, x=x, connect="all")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,79 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+
+class Persistence(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.decay = 1.0
+        self.channels = None
+        self.image = None
+        self._shape = None
+        self._reset = False
+
+    def reset(self):
+        # Called from the GUI thread, applied by the next add() on the acquisition thread:
+        self._reset = True
+
+    def _allocate(self, shape):
+        count, length = shape
+        # Flat (channel, column, row) bin offset of every sample, excluding the row:
+        columns = np.arange(length, dtype=np.int64) * self.width // length
+        self._offsets = (np.arange(count, dtype=np.int32)[:, np.newaxis] * self.width + columns.astype(np.int32)) * self.height
+        self._rows = np.empty(shape, dtype=np.float32)
+        self._index = np.empty(shape, dtype=np.int32)
+        self._shape = shape
+
+    def add(self, channels, block, y_min, y_max):
+        if block.shape != self._shape:
+            self._allocate(block.shape)
+        image = self.image
+        if self._reset or image is None or self.channels != channels or len(image) != len(block):
+            self._reset = False
+            image = np.zeros((len(block), self.width, self.height), dtype=np.float32)
+            self.image = image
+            self.channels = channels
+
+        y_min = np.asarray(y_min, dtype=np.float32)[:, np.newaxis]
+        scale = (self.height / (np.asarray(y_max, dtype=np.float32) - y_min[:, 0]))[:, np.newaxis]
+
+        rows = self._rows
+        np.subtract(block, y_min, out=rows)
+        rows *= scale
+        np.clip(rows, 0, self.height - 1, out=rows)
+        np.add(rows, self._offsets, out=self._index, casting="unsafe")
+
+        counts = np.bincount(self._index.ravel(), minlength=image.size)
+        if self.decay < 1:
+            image *= self.decay
+        image += counts.reshape(image.shape)
@@ -0,0 +1,146 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import os
+import json
+import time
+import struct
+import threading
+import numpy as np
+from acquisition import AcquisitionBuffer, BUFFER_COUNT
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_FILE = "segment-{:05d}.f32"
+FRAMES_FILE = "frames.f64"
+METADATA_FILE = "metadata.json"
+
+
+class Recorder(object):
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.frames = 0
+
+        self._metadata = dict(metadata or {})
+        self._metadata["start"] = time.time()
+        self._metadata["frames"] = FRAMES_FILE
+        self._metadata["segments"] = []
+        self._segment = None
+        self._segment_key = None
+        self._segment_frame = 0
+        self._buffers = []
+        self._index = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Timestamp and sample frequency of every frame:
+        self._frames_file = open(os.path.join(path, FRAMES_FILE), "wb")
+
+    def get(self, channels, length, exclude=(), segment_count=1):
+        # Locked until commit(), so close() can't unmap a segment during ScpGetData:
+        self._lock.acquire()
+        if self._closed:
+            self._lock.release()
+            return None
+
+        try:
+            channels = tuple(channels)
+            if self._segment is None or self._segment_key != (channels, length, segment_count) or self._segment_frame + segment_count > len(self._segment):
+                self._new_segment(channels, length, segment_count)
+
+            for i in range(len(self._buffers)):
+                buf = self._buffers[self._index]
+                self._index = (self._index + 1) % len(self._buffers)
+                if buf not in exclude:
+                    break
+
+            # Segments of a segmented capture are stored as consecutive frames:
+            buf.set_segments(self._segment[self._segment_frame:self._segment_frame + segment_count])
+        except:
+            # E.g. a full disk, don't leave the lock held for the next get() or close():
+            self._lock.release()
+            raise
+
+        return buf
+
+    def abort(self, buf):
+        # The data wasn't read, release the frame without recording it:
+        self._lock.release()
+
+    def commit(self, buf):
+        try:
+            for timestamp in buf.segment_timestamps:
+                self._frames_file.write(struct.pack("<dd", timestamp, buf.sample_frequency))
+            self._metadata["segments"][-1]["frames"] += buf.segment_count
+            self._segment_frame += buf.segment_count
+            self.frames += buf.segment_count
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._close_segment()
+                self._frames_file.close()
+                self._metadata["stop"] = time.time()
+                self._write_metadata()
+
+    def _new_segment(self, channels, length, segment_count):
+        self._close_segment()
+
+        active_count = max(sum(1 for active in channels if active), 1)
+        frame_count = max(SEGMENT_SIZE // (active_count * length * 4), segment_count)
+        filename = SEGMENT_FILE.format(len(self._metadata["segments"]))
+
+        # Sparse file, pages are only backed by disk once written:
+        self._segment = np.memmap(os.path.join(self.path, filename), dtype=np.float32, mode="w+", shape=(frame_count, active_count, length))
+        self._segment_key = (channels, length, segment_count)
+        self._segment_frame = 0
+        self._buffers = [AcquisitionBuffer(channels, length, False, segment_count) for i in range(BUFFER_COUNT)]
+        self._index = 0
+
+        self._metadata["segments"].append({
+            "file": filename,
+            "first_frame": self.frames,
+            "frames": 0,
+            "channels": [i for i in range(len(channels)) if channels[i]],
+            "record_length": length,
+        })
+        self._write_metadata()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.flush()
+            self._segment = None
+            self._frames_file.flush()
+
+    def _write_metadata(self):
+        with open(os.path.join(self.path, METADATA_FILE), "w") as f:
+            json.dump(self._metadata, f, indent=2)
@@ -0,0 +1,64 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+
+class RingBuffer(object):
+    def __init__(self, channels, capacity):
+        self.channels = tuple(channels)
+        self.capacity = capacity
+        self.count = 0
+
+        # Every sample is stored twice, so the last capacity samples are always
+        # available as one contiguous view:
+        self._data = [np.zeros(2 * capacity, dtype=np.float32) if active else None for active in self.channels]
+
+    def append(self, data, length=None):
+        if length is None:
+            length = max(len(chdata) for chdata in data if chdata is not None)
+        count = min(length, self.capacity)
+        offset = length - count
+        pos = (self.count + offset) % self.capacity
+        first = min(count, self.capacity - pos)
+
+        for src, dst in zip(data, self._data):
+            if src is not None and dst is not None:
+                src = src[offset:offset + count]
+                dst[pos:pos + first] = src[:first]
+                dst[pos + self.capacity:pos + self.capacity + first] = src[:first]
+                dst[:count - first] = src[first:]
+                dst[self.capacity:self.capacity + count - first] = src[first:]
+
+        self.count += length
+
+    def latest(self):
+        pos = self.count % self.capacity
+        return [chdata[pos:pos + self.capacity] if chdata is not None else None for chdata in self._data]
@@ -38,12 +38,46 @@ import utils
 COMBINE_ALLOWED_PRODUCTS_IDS = [libtiepie.PID_HS4, libtiepie.PID_HS4D]
 
 
-class SelectInstrumentsUI(QDialog):
+class DiscoveryThread(QThread):
+    found = pyqtSignal(object)
+
     def __init__(self, parent=None):
+        super(DiscoveryThread, self).__init__(parent)
+        self.error = None
+
+    def run(self):
+        try:
+            libtiepie.device_list.update()
+            for dev in libtiepie.device_list:
+                if dev.types != 0:
+                    self.found.emit(dev)
+        except Exception, e:
+            self.error = e
+
+
+class OpenThread(QThread):
+    def __init__(self, items, parent=None):
+        super(OpenThread, self).__init__(parent)
+        self.items = items
+        self.instruments = []
+
+    def run(self):
+        self.instruments = utils.open_instruments(self.items)
+
+
+class SelectInstrumentsUI(QDialog):
+    discovery_finished = pyqtSignal(int, object)
+    instruments_opened = pyqtSignal(int)
+
+    def __init__(self, parent=None, discover=False):
         super(SelectInstrumentsUI, self).__init__(parent)
 
         mainLayout = QVBoxLayout()
 
+        self._status = QLabel(self)
+        self._status.setVisible(False)
+        mainLayout.addWidget(self._status)
+
         self._list = QListView(self)
         self._list_data = QStandardItemModel(self._list)
         self._list_data.itemChanged.connect(self._item_changed)
@@ -63,24 +97,51 @@ class SelectInstrumentsUI(QDialog):
         btn.clicked.connect(self._open_clicked)
         buttonLayout.addWidget(btn)
 
-        self._update_list()
+        if discover:
+            self._discover()
+        else:
+            self._update_list()
 
         self.setLayout(mainLayout)
         self.setWindowTitle("Select instruments")
         self.resize(400, 200)
 
+    def _discover(self):
+        # Device list update runs in the background, the window stays responsive and the list is filled once it is done:
+        self._list_data.clear()
+        self._list_data_rows = []
+        self._status.setText("Searching for instruments...")
+        self._status.setVisible(True)
+
+        self._discovery = DiscoveryThread(self)
+        self._discovery.found.connect(self._add_item)
+        self._discovery.finished.connect(self._discovery_done)
+        self._discovery.start()
+
+    def _discovery_done(self):
+        utils.log_startup("discovery finished")
+        if self._discovery.error is not None:
+            self._status.setText(str(self._discovery.error))
+        else:
+            self._status.setVisible(False)
+        self.discovery_finished.emit(len(self._list_data_rows), self._discovery.error)
+
     def _update_list(self):
         self._list_data.clear()
         self._list_data_rows = []
 
         for dev in libtiepie.device_list:
             if dev.types != 0:
-                item = QStandardItem(dev.name + " s/n " + str(dev.serial_number))
-                item.setCheckable(True)
-                item.setData(dev)
-                self._list_data.appendRow(item)
-                self._list_data_rows.append(item)
+                self._add_item(dev)
+
+        self._item_changed()
 
+    def _add_item(self, dev):
+        item = QStandardItem(dev.name + " s/n " + str(dev.serial_number))
+        item.setCheckable(True)
+        item.setData(dev)
+        self._list_data.appendRow(item)
+        self._list_data_rows.append(item)
         self._item_changed()
 
     def _item_changed(self, index=None):
@@ -97,11 +158,28 @@ class SelectInstrumentsUI(QDialog):
         self._btn_combine.setEnabled(count >= 2)
 
     def _open_clicked(self, checked):
+        items = []
         for row in self._list_data_rows:
             if row.checkState() == Qt.Checked:
-                utils.create_ui(utils.unwrap_QVariant(row.data()), self.parent())
-
+                items.append(utils.unwrap_QVariant(row.data()))
+        self.open_instruments(items)
+
+    def open_instruments(self, items):
+        # Devices are opened in the background, the windows are created once all of them are done:
+        self._status.setText("Opening instruments...")
+        self._status.setVisible(True)
+        self.setEnabled(False)
+
+        self._opening = OpenThread(items, self)
+        self._opening.finished.connect(self._open_done)
+        self._opening.start()
+
+    def _open_done(self):
+        count = utils.create_windows(self._opening.instruments, self.parent())
+        self._status.setVisible(False)
+        self.setEnabled(True)
         self.hide()
+        self.instruments_opened.emit(count)
 
     def _combine_clicked(self, checked):
         scps = []
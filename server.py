@@ -0,0 +1,222 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import os
+import socket
+import select
+import struct
+import threading
+import Queue
+import numpy as np
+
+MAGIC = b"TPUI"
+VERSION = 1
+
+# Magic, version, channel count, sequence, timestamp, sample frequency, record length, segment count:
+FRAME_HEADER = struct.Struct("<4sHHQddII")
+# Channel number, data value min and max (full scale) for every channel in the payload:
+CHANNEL_HEADER = struct.Struct("<Hdd")
+
+CLIENT_QUEUE_SIZE = 8
+
+
+def parse_address(address):
+    # host:port for TCP, anything else is a Unix socket path:
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def frame_header(sequence, timestamp, sample_frequency, record_length, segment_count, channels):
+    header = [FRAME_HEADER.pack(MAGIC, VERSION, len(channels), sequence, timestamp, sample_frequency, record_length, segment_count)]
+    for chnum, data_value_min, data_value_max in channels:
+        header.append(CHANNEL_HEADER.pack(chnum, data_value_min, data_value_max))
+    return b"".join(header)
+
+
+def send_parts(sock, parts):
+    # Scatter/gather where available, the payload is never joined with the header:
+    if hasattr(sock, "sendmsg"):
+        sent = sock.sendmsg(parts)
+        for part in parts:
+            if sent >= len(part):
+                sent -= len(part)
+            else:
+                sock.sendall(part[sent:])
+                sent = 0
+    else:
+        for part in parts:
+            sock.sendall(part)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    while size:
+        n = sock.recv_into(view, size)
+        if n == 0:
+            raise EOFError()
+        view = view[n:]
+        size -= n
+    return data
+
+
+def read_frame(sock):
+    magic, version, channel_count, sequence, timestamp, sample_frequency, record_length, segment_count = FRAME_HEADER.unpack(bytes(_recv_exactly(sock, FRAME_HEADER.size)))
+    if magic != MAGIC or version != VERSION:
+        raise Exception("Invalid frame header")
+    data = _recv_exactly(sock, CHANNEL_HEADER.size * channel_count)
+    channels = [CHANNEL_HEADER.unpack_from(bytes(data), i * CHANNEL_HEADER.size) for i in range(channel_count)]
+    payload = np.frombuffer(_recv_exactly(sock, segment_count * channel_count * record_length * 4), dtype=np.float32)
+    return {
+        "sequence": sequence,
+        "timestamp": timestamp,
+        "sample_frequency": sample_frequency,
+        "channels": channels,
+        "data": payload.reshape(segment_count, channel_count, record_length),
+    }
+
+
+class Client(threading.Thread):
+    def __init__(self, server, sock, address):
+        super(Client, self).__init__()
+        self.daemon = True
+
+        self.address = address
+        self.frames = 0
+        self.dropped = 0
+
+        self._server = server
+        self._sock = sock
+        self._queue = Queue.Queue(CLIENT_QUEUE_SIZE)
+
+    def put(self, frame):
+        # Never blocks the acquisition, a slow client loses frames instead:
+        try:
+            self._queue.put_nowait(frame)
+        except Queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Never blocks either, the shutdown breaks a sendall() to a client that stopped reading:
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Queue.Empty:
+                break
+        try:
+            self._queue.put_nowait(None)
+        except Queue.Full:
+            pass
+
+    def run(self):
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    break
+                send_parts(self._sock, frame)
+                self.frames += 1
+        except socket.error:
+            pass
+        finally:
+            self._sock.close()
+            self._server.remove(self)
+
+
+class FrameServer(threading.Thread):
+    def __init__(self, address):
+        super(FrameServer, self).__init__()
+        self.daemon = True
+
+        self.address = address
+        self.sequence = 0
+
+        self._family, self._bind_address = parse_address(address)
+        self._clients = []
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        if self._family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+        self._sock = socket.socket(self._family, socket.SOCK_STREAM)
+        if self._family == socket.AF_INET:
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self._bind_address)
+        self._sock.listen(5)
+
+    @property
+    def clients(self):
+        with self._lock:
+            return list(self._clients)
+
+    def run(self):
+        while not self._stopped:
+            ready, _, _ = select.select([self._sock], [], [], 0.1)
+            if ready and not self._stopped:
+                sock, address = self._sock.accept()
+                client = Client(self, sock, address)
+                with self._lock:
+                    self._clients.append(client)
+                client.start()
+
+    def remove(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def stop(self):
+        self._stopped = True
+        self.join()
+        self._sock.close()
+        if self._family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        for client in self.clients:
+            client.close()
+
+    def publish(self, buf, settings):
+        clients = self.clients
+        self.sequence += 1
+        if not clients:
+            return
+
+        channels = [(i, settings.channels[i].data_value_min, settings.channels[i].data_value_max) for i in range(len(buf.channels)) if buf.channels[i]]
+        header = frame_header(self.sequence, buf.timestamp, buf.sample_frequency, buf.length, buf.segment_count, channels)
+
+        # Acquisition buffers are reused, so the payload is copied once and shared by all clients:
+        payload = memoryview(buf.segments.reshape(-1).view(np.uint8).copy())
+        for client in clients:
+            client.put((header, payload))
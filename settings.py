@@ -0,0 +1,86 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from collections import namedtuple
+import libtiepie
+
+ChannelSettings = namedtuple("ChannelSettings", ["enabled", "coupling", "range", "auto_ranging", "data_value_min", "data_value_max"])
+
+TriggerSettings = namedtuple("TriggerSettings", ["kinds", "kind", "levels", "hystereses", "conditions", "condition", "times"])
+
+ScopeSettings = namedtuple("ScopeSettings", ["measure_mode", "sample_frequency", "record_length", "pre_sample_ratio", "segment_count",
+                                             "active_channels", "channel_count", "channels", "trigger"])
+
+GeneratorSettings = namedtuple("GeneratorSettings", ["signal_type", "frequency", "width", "amplitude", "offset", "phase", "symmetry"])
+
+
+def _values(values):
+    return tuple(values[i] for i in range(len(values)))
+
+
+def channel_settings(ch):
+    return ChannelSettings(ch.enabled, ch.coupling, ch.range, ch.auto_ranging, ch.data_value_min, ch.data_value_max)
+
+
+def trigger_settings(tr):
+    # Trigger inputs have no levels, hystereses, conditions or times:
+    return TriggerSettings(tr.kinds, tr.kind,
+                           _values(tr.levels) if hasattr(tr, 'levels') else (),
+                           _values(tr.hystereses) if hasattr(tr, 'hystereses') else (),
+                           tr.conditions if hasattr(tr, 'conditions') else libtiepie.TCM_NONE,
+                           tr.condition if hasattr(tr, 'conditions') else None,
+                           _values(tr.times) if hasattr(tr, 'times') else ())
+
+
+def scope_settings(scp, trigger_source=None):
+    # Immutable copy of the settings, the acquisition and render paths read these instead of the library:
+    measure_mode = scp.measure_mode
+    channels = tuple(channel_settings(ch) for ch in scp.channels)
+    active_channels = tuple(ch.enabled for ch in channels)
+    segment_count = scp.segment_count if measure_mode == libtiepie.MM_BLOCK else 1
+    trigger = trigger_settings(trigger_source) if trigger_source is not None else None
+    return ScopeSettings(measure_mode, scp.sample_frequency, scp.record_length, scp.pre_sample_ratio, segment_count,
+                         active_channels, len(active_channels), channels, trigger)
+
+
+def generator_settings(gen):
+    # Only properties the signal type supports are read, others are None:
+    signal_type = gen.signal_type
+
+    def value(mask, name):
+        return getattr(gen, name) if signal_type & mask != 0 else None
+
+    return GeneratorSettings(signal_type,
+                             value(libtiepie.STM_FREQUENCY, "frequency"),
+                             value(libtiepie.STM_WIDTH, "width"),
+                             value(libtiepie.STM_AMPLITUDE, "amplitude"),
+                             value(libtiepie.STM_OFFSET, "offset"),
+                             value(libtiepie.STM_PHASE, "phase"),
+                             value(libtiepie.STM_SYMMETRY, "symmetry"))
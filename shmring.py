@@ -0,0 +1,185 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import os
+import time
+import numpy as np
+
+SHM_DIR = "/dev/shm"
+MAGIC = b"TPSR"
+VERSION = 1
+SLOT_COUNT = 8
+
+RING_HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("slot_count", "<u8"), ("slot_size", "<u8"), ("head", "<u8"), ("reserved", "<u8", 4)])
+
+# Sequence is odd while the slot is written and 2 * frame once complete (a seqlock):
+SLOT_HEADER = np.dtype([("sequence", "<u8"), ("frame", "<u8"), ("timestamp", "<f8"), ("sample_frequency", "<f8"),
+                        ("channels", "<u8"), ("channel_count", "<u4"), ("segment_count", "<u4"), ("record_length", "<u8"), ("reserved", "<u8")])
+
+
+def _slot_offset(index, slot_size):
+    return RING_HEADER.itemsize + index * (SLOT_HEADER.itemsize + slot_size)
+
+
+class _Ring(object):
+    def __init__(self, name, mode, slot_count=None, slot_size=None):
+        self.name = name
+        self.path = os.path.join(SHM_DIR, name)
+        if slot_count is None:
+            header = np.fromfile(self.path, dtype=RING_HEADER, count=1)[0]
+            if header["magic"] != MAGIC or header["version"] != VERSION:
+                raise Exception("Invalid shared memory ring: " + self.path)
+            slot_count = int(header["slot_count"])
+            slot_size = int(header["slot_size"])
+
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+
+        self._map = np.memmap(self.path, dtype=np.uint8, mode=mode, shape=(_slot_offset(slot_count, slot_size), ))
+        self._header = self._map[:RING_HEADER.itemsize].view(RING_HEADER)
+        self._slot_headers = []
+        self._payloads = []
+        for i in range(slot_count):
+            offset = _slot_offset(i, slot_size)
+            self._slot_headers.append(self._map[offset:offset + SLOT_HEADER.itemsize].view(SLOT_HEADER))
+            self._payloads.append(self._map[offset + SLOT_HEADER.itemsize:offset + SLOT_HEADER.itemsize + slot_size])
+
+    @property
+    def head(self):
+        return int(self._header["head"][0])
+
+
+class ShmRing(_Ring):
+    def __init__(self, name, slot_size, slot_count=SLOT_COUNT):
+        # Page aligned slots, so payloads keep the alignment of the mapping:
+        slot_size = -(-(slot_size + SLOT_HEADER.itemsize) // 4096) * 4096 - SLOT_HEADER.itemsize
+        with open(os.path.join(SHM_DIR, name), "wb") as f:
+            f.truncate(_slot_offset(slot_count, slot_size))
+        super(ShmRing, self).__init__(name, "r+", slot_count, slot_size)
+
+        self.frames = 0
+        self.skipped = 0
+
+        self._header["slot_count"] = slot_count
+        self._header["slot_size"] = slot_size
+        self._header["version"] = VERSION
+        self._header["magic"] = MAGIC
+
+    def write(self, buf):
+        segments = buf.segments
+        if segments.nbytes > self.slot_size:
+            # Slots are sized when the ring is created, readers keep their mapping:
+            self.skipped += 1
+            return
+
+        frame = self.head + 1
+        header = self._slot_headers[frame % self.slot_count]
+        header["sequence"] = 2 * frame - 1
+        header["frame"] = frame
+        header["timestamp"] = buf.timestamp
+        header["sample_frequency"] = buf.sample_frequency
+        header["channels"] = sum(1 << i for i in range(len(buf.channels)) if buf.channels[i])
+        header["channel_count"] = segments.shape[1]
+        header["segment_count"] = segments.shape[0]
+        header["record_length"] = segments.shape[2]
+        self._payloads[frame % self.slot_count][:segments.nbytes] = segments.reshape(-1).view(np.uint8)
+        header["sequence"] = 2 * frame
+        self._header["head"] = frame
+        self.frames += 1
+
+    def close(self):
+        # Mapped readers keep their view, the memory is freed once the last one unmaps:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ShmFrame(object):
+    def __init__(self, header, data, sequence):
+        self.frame = int(header["frame"][0])
+        self.timestamp = float(header["timestamp"][0])
+        self.sample_frequency = float(header["sample_frequency"][0])
+        self.channels = [i for i in range(64) if int(header["channels"][0]) & (1 << i)]
+        self.data = data
+
+        self._header = header
+        self._sequence = sequence
+
+    def valid(self):
+        # False once the writer reused the slot, data read before this call may be torn:
+        return int(self._header["sequence"][0]) == self._sequence
+
+
+class ShmRingReader(_Ring):
+    def __init__(self, name):
+        super(ShmRingReader, self).__init__(name, "r")
+
+        self.missed = 0
+        self._next = self.head + 1
+
+    @property
+    def closed(self):
+        # The writer unlinks the ring when it stops:
+        return not os.path.exists(self.path)
+
+    def read(self, timeout=None, interval=1e-3):
+        # Zero copy: the frame data is a view on the shared memory, check valid() after use:
+        end = time.time() + timeout if timeout is not None else None
+        while True:
+            head = self.head
+            if head >= self._next:
+                if head - self._next >= self.slot_count - 1:
+                    # Overrun, skip to the oldest frame that isn't about to be overwritten:
+                    self.missed += head - self._next - self.slot_count + 2
+                    self._next = head - self.slot_count + 2
+
+                frame = self.get(self._next)
+                if frame is not None:
+                    self._next += 1
+                    return frame
+            elif end is not None and time.time() >= end:
+                return None
+            time.sleep(interval)
+
+    def get(self, frame):
+        header = self._slot_headers[frame % self.slot_count]
+        sequence = 2 * frame
+        if int(header["sequence"][0]) != sequence:
+            return None
+
+        segment_count = int(header["segment_count"][0])
+        channel_count = int(header["channel_count"][0])
+        record_length = int(header["record_length"][0])
+        nbytes = segment_count * channel_count * record_length * 4
+        data = self._payloads[frame % self.slot_count][:nbytes].view(np.float32).reshape(segment_count, channel_count, record_length)
+        return ShmFrame(header, data, sequence)
+
+
+def frame_size(settings):
+    return settings.segment_count * max(sum(1 for active in settings.active_channels if active), 1) * settings.record_length * 4
@@ -0,0 +1,46 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import os
+import sys
+
+SIMULATE_ENV = "LIBTIEPIE_SIMULATE"
+SIMULATE_FLAG = "--simulate"
+
+
+def install_if_requested(argv):
+    # Kept apart from libtiepiesim, which loads numpy, so a normal start doesn't pay for it:
+    if SIMULATE_FLAG in argv:
+        argv.remove(SIMULATE_FLAG)
+        os.environ[SIMULATE_ENV] = "1"
+
+    if os.environ.get(SIMULATE_ENV, "0") not in ("", "0"):
+        import libtiepiesim
+        libtiepiesim.install()
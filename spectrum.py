@@ -0,0 +1,150 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import numpy as np
+
+WINDOW_RECTANGULAR = 0
+WINDOW_HANN = 1
+WINDOW_BLACKMAN_HARRIS = 2
+WINDOW_FLAT_TOP = 3
+
+AVERAGING_NONE = 0
+AVERAGING_LINEAR = 1
+AVERAGING_EXPONENTIAL = 2
+AVERAGING_PEAK_HOLD = 3
+
+SCALE_DBV = 0
+SCALE_DBM = 1
+
+# dBm into 50 Ohm relative to dBV: 10 * log10(1 V^2 / 50 Ohm / 1 mW)
+DBM_OFFSET = 10 * np.log10(1 / (50 * 1e-3))
+
+# Cosine sum window coefficients:
+WINDOW_COEFFICIENTS = {
+    WINDOW_RECTANGULAR: [1.0],
+    WINDOW_HANN: [0.5, 0.5],
+    WINDOW_BLACKMAN_HARRIS: [0.35875, 0.48829, 0.14128, 0.01168],
+    WINDOW_FLAT_TOP: [0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368],
+}
+
+
+def window(kind, length):
+    n = 2 * np.pi * np.arange(length) / length
+    result = np.zeros(length)
+    for k, a in enumerate(WINDOW_COEFFICIENTS[kind]):
+        result += (-1) ** k * a * np.cos(k * n)
+    return result
+
+
+class SpectrumAnalyzer(object):
+    def __init__(self):
+        self.window = WINDOW_HANN
+        self.averaging = AVERAGING_NONE
+        self.average_count = 16
+        self.scale = SCALE_DBV
+
+        self._windows = {}
+        self._frequencies = {}
+        self._shape = None
+        self._count = 0
+
+    def reset(self):
+        self._count = 0
+
+    def frequencies(self, length, sample_frequency):
+        key = (length, sample_frequency)
+        frequencies = self._frequencies.get(key)
+        if frequencies is None:
+            frequencies = np.fft.rfftfreq(length, 1.0 / sample_frequency).astype(np.float32)
+            frequencies.flags.writeable = False
+            self._frequencies[key] = frequencies
+        return frequencies
+
+    def _window(self, length):
+        key = (self.window, length)
+        value = self._windows.get(key)
+        if value is None:
+            w = window(self.window, length)
+            # Scale so a sine of amplitude A shows as A / sqrt(2) Vrms:
+            value = (w.astype(np.float32), 2.0 / w.sum() ** 2)
+            self._windows[key] = value
+        return value
+
+    def _allocate(self, shape):
+        count, length = shape
+        bins = length // 2 + 1
+        self._windowed = np.empty(shape, dtype=np.float32)
+        self._power = np.empty((count, bins))
+        self._temp = np.empty((count, bins))
+        self._average = np.empty((count, bins))
+        self._result = np.empty((count, bins), dtype=np.float32)
+        self._shape = shape
+        self._count = 0
+
+    def process(self, block, sample_frequency):
+        if block.shape != self._shape:
+            self._allocate(block.shape)
+
+        length = block.shape[1]
+        w, scale = self._window(length)
+        np.multiply(block, w, out=self._windowed)
+        spectrum = np.fft.rfft(self._windowed, axis=1)
+
+        power = self._power
+        np.multiply(spectrum.real, spectrum.real, out=power)
+        np.multiply(spectrum.imag, spectrum.imag, out=self._temp)
+        power += self._temp
+        power *= scale
+
+        average = self._average
+        self._count += 1
+        if self.averaging == AVERAGING_NONE or self._count == 1:
+            average[...] = power
+        elif self.averaging == AVERAGING_PEAK_HOLD:
+            np.maximum(average, power, out=average)
+        else:
+            if self.averaging == AVERAGING_LINEAR:
+                weight = 1.0 / min(self._count, self.average_count)
+            else:
+                weight = 1.0 / self.average_count
+            power -= average
+            power *= weight
+            average += power
+
+        # Power (Vrms^2) to dB:
+        result = self._result
+        np.maximum(average, 1e-20, out=self._temp)
+        np.log10(self._temp, out=self._temp)
+        np.multiply(self._temp, 10, out=result, casting="unsafe")
+        result[:, 0] -= 10 * np.log10(2)  # DC has no negative frequency counterpart
+        if self.scale == SCALE_DBM:
+            result += DBM_OFFSET
+
+        return self.frequencies(length, sample_frequency), result
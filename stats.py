@@ -0,0 +1,110 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+import math
+import time
+import numpy as np
+
+HISTOGRAM_MIN = 1e-6
+HISTOGRAM_DECADES = 7
+HISTOGRAM_BINS_PER_DECADE = 20
+
+
+class Histogram(object):
+    def __init__(self):
+        # Logarithmic bins from 1 us to 10 s, plus an underflow and overflow bin:
+        self.counts = np.zeros(HISTOGRAM_DECADES * HISTOGRAM_BINS_PER_DECADE + 2, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        if value >= HISTOGRAM_MIN:
+            index = min(int(math.log10(value / HISTOGRAM_MIN) * HISTOGRAM_BINS_PER_DECADE) + 1, len(self.counts) - 1)
+        else:
+            index = 0
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        if self.count == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), self.count * percent / 100.0))
+        # Upper edge of the bin:
+        return min(HISTOGRAM_MIN * 10 ** (float(index) / HISTOGRAM_BINS_PER_DECADE), self.max)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "bin_min": HISTOGRAM_MIN,
+            "bins_per_decade": HISTOGRAM_BINS_PER_DECADE,
+            "counts": self.counts.tolist(),
+        }
+
+
+class Stats(object):
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.counters = {}
+
+    def time(self):
+        return time.time() if self.enabled else 0
+
+    def add(self, name, start):
+        if self.enabled and start:
+            self.add_value(name, time.time() - start)
+
+    def add_value(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(value)
+
+    def increment(self, name, count=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def to_dict(self):
+        return {
+            "histograms": dict((name, histogram.to_dict()) for name, histogram in self.histograms.items()),
+            "counters": dict(self.counters),
+        }
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from __future__ import print_function
+import sys
+import time
+import socket
+import argparse
+import server
+import shmring
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Receive frames from an oscilloscope window or headless capture.")
+    parser.add_argument("address", help="Unix socket path or host:port, or with --shm the shared memory name")
+    parser.add_argument("--shm", action="store_true", help="read from a shared memory ring")
+    parser.add_argument("-n", "--count", type=int, help="stop after this many frames")
+    args = parser.parse_args()
+
+    if args.shm:
+        ring = shmring.ShmRingReader(args.address)
+    else:
+        family, address = server.parse_address(args.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(address)
+
+    frames = 0
+    missed = 0
+    sequence = None
+    start = time.time()
+    try:
+        while args.count is None or frames < args.count:
+            if args.shm:
+                shm_frame = ring.read(1.0)
+                if shm_frame is None:
+                    if ring.closed:
+                        break
+                    continue
+                frame = {"sequence": shm_frame.frame, "data": shm_frame.data}
+            else:
+                frame = server.read_frame(sock)
+            if sequence is not None:
+                missed += frame["sequence"] - sequence - 1
+            sequence = frame["sequence"]
+            frames += 1
+
+            data = frame["data"]
+            print("#{:d}  {:d} x {:d} x {:d}  min {:.3f}  max {:.3f}".format(sequence, data.shape[0], data.shape[1], data.shape[2], data.min(), data.max()))
+            if args.shm and not shm_frame.valid():
+                print("#{:d} overwritten while reading".format(sequence), file=sys.stderr)
+    except (KeyboardInterrupt, EOFError):
+        pass
+
+    duration = time.time() - start
+    print("{:d} frames in {:.3f} s, {:d} missed".format(frames, duration, missed), file=sys.stderr)
@@ -0,0 +1,57 @@
+#
+# This file is part of the libtiepie-ui program.
+#
+# Copyright (C) 2015 Reinder Feenstra <reinderfeenstra@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation; either version 2 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, see <http://www.gnu.org/licenses>.
+#
+# Linking libtiepie-ui statically or dynamically with other modules is making
+# a combined work based on libtiepie-ui. Thus, the terms and conditions of the
+# GNU General Public License cover the whole combination.
+#
+# In addition, as a special exception, the copyright holders of libtiepie-ui
+# give you permission to combine libtiepie-ui with free software programs or
+# libraries that are released under the GNU LGPL and with code included in the
+# standard release of libtiepie (or modified versions of such code). You may
+# copy and distribute such a system following the terms of the GNU GPL for
+# libtiepie-ui and the licenses of the other code concerned.
+#
+
+from collections import OrderedDict
+import numpy as np
+
+
+class TimebaseCache(object):
+    def __init__(self, size=4):
+        self._size = size
+        self._cache = OrderedDict()
+
+    def get(self, record_length, sample_frequency, pre_sample_ratio=0):
+        key = (record_length, sample_frequency, pre_sample_ratio)
+        timebase = self._cache.pop(key, None)
+        if timebase is None:
+            # Shift by the number of pre samples, so the trigger point is at t = 0:
+            pre_samples = int(round(record_length * pre_sample_ratio))
+            timebase = np.arange(-pre_samples, record_length - pre_samples, dtype=np.float32)
+            timebase /= np.float32(sample_frequency)
+            timebase.flags.writeable = False
+
+            if len(self._cache) >= self._size:
+                self._cache.popitem(last=False)
+
+        self._cache[key] = timebase
+        return timebase
+
+    def clear(self):
+        self._cache.clear()
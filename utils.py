@@ -28,11 +28,13 @@
 # libtiepie-ui and the licenses of the other code concerned.
 #
 
+from __future__ import print_function
 import os
+import sys
 import math
+import time
+import threading
 from ctypes import *
-from PyQt4.QtCore import *
-from PyQt4.QtGui import *
 import libtiepie
 
 PRODUCT_IDS = {
@@ -43,6 +45,11 @@ PRODUCT_IDS = {
     "HS5": libtiepie.PID_HS5,
 }
 
+STARTUP_LOG_ENV = "LIBTIEPIE_UI_STARTUP_LOG"
+
+# Overwritten by the entry script with the time it was started:
+startup_time = time.time()
+
 libc = cdll.LoadLibrary("libc.so.6")
 
 
@@ -82,19 +89,58 @@ def try_open_device(argv, device_type):
         raise Exception("No devices found")
 
 
-def create_ui(item, parent=None):
+def log_startup(event):
+    if os.environ.get(STARTUP_LOG_ENV, "0") not in ("", "0"):
+        print("{:8.1f} ms  {:s}".format((time.time() - startup_time) * 1e3, event), file=sys.stderr)
 
-    scp = item.open_oscilloscope() if (item.types & libtiepie.DEVICETYPE_OSCILLOSCOPE) != 0 else None
-    if scp:
-        from oscilloscopeui import OscilloscopeUI
-        scpui = OscilloscopeUI(scp, parent)
-        scpui.show()
 
-    gen = item.open_generator() if (item.types & libtiepie.DEVICETYPE_GENERATOR) != 0 else None
-    if gen:
-        from generatorui import GeneratorUI
-        genui = GeneratorUI(gen, parent)
-        genui.show()
+def open_instruments(items):
+    # Opening a device takes a while, open all of them in parallel. Blocks, call it off the GUI thread:
+    results = [(None, None)] * len(items)
+
+    def open_device(item, open):
+        try:
+            return open()
+        except Exception, e:
+            print(item.name + " s/n " + str(item.serial_number) + ": " + str(e), file=sys.stderr)
+            return None
+
+    def open_item(index):
+        item = items[index]
+        # Opened separately, so a generator that fails to open doesn't lose the oscilloscope:
+        scp = open_device(item, item.open_oscilloscope) if (item.types & libtiepie.DEVICETYPE_OSCILLOSCOPE) != 0 else None
+        gen = open_device(item, item.open_generator) if (item.types & libtiepie.DEVICETYPE_GENERATOR) != 0 else None
+        results[index] = (scp, gen)
+
+    threads = [threading.Thread(target=open_item, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log_startup("devices opened")
+
+    return results
+
+
+def create_windows(instruments, parent=None):
+    count = 0
+    for scp, gen in instruments:
+        if scp:
+            # Imported on first use, pyqtgraph and numpy are only loaded once a window is needed:
+            from oscilloscopeui import OscilloscopeUI
+            scpui = OscilloscopeUI(scp, parent)
+            scpui.show()
+            log_startup("oscilloscope window: " + scp.name)
+            count += 1
+
+        if gen:
+            from generatorui import GeneratorUI
+            genui = GeneratorUI(gen, parent)
+            genui.show()
+            log_startup("generator window: " + gen.name)
+            count += 1
+
+    return count
 
 
 def val_to_str(value, digits=6, decimals=3):
@@ -161,6 +207,8 @@ def str_to_pid(value):
 
 
 def unwrap_QVariant(value):
+    from PyQt4.QtCore import QMetaType
+
     if(value.type() == QMetaType.Int):
         return value.toInt()[0]
     elif(value.type() == QMetaType.Double):